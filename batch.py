@@ -0,0 +1,162 @@
+"""
+
+Headless batch rendering for the data analysis gui.
+Renders one PNG per csv file from a JSON plot spec, with the Agg backend
+and without wx, spreading the files over a process pool.
+
+    python batch.py spec.json data/*.csv -o plots -j 8
+
+The spec holds what is otherwise entered in GraphFrame:
+
+    {"columns": [["Time", "Float"], ["ID", "Category"], ["Temp", "Float"]],
+     "x": "Time", "y": ["Temp"], "id": "ID", "ids": ["A7", "B2"],
+     "xlim": [null, 500], "ylim": [0, 100],
+     "xlabel": "Time (s)", "ylabel": "Temp", "title": true,
+     "grid": true, "background": true, "xticklabels": true,
+     "size": [8, 6], "dpi": 100}
+
+"columns" lists every column with a format from the parameter list. If it
+is left out the header line and inferred formats are used, as with "Use
+First Line". A null limit is automatic, as in the gui.
+
+License: this code is in the public domain
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import compressed
+import engine
+
+
+def load(spec, filename):
+    """ Parses filename into a ColumnTable using the spec's columns """
+    columns = spec.get('columns')
+    if columns is None:
+        header, types = engine.infer_columns(filename)
+        columns = [(name, t[0]) for name, t in zip(header, types)]
+    return engine.load(filename, columns, processes=1)
+
+
+def limit(spec, key, i, auto):
+    value = (spec.get(key) or [None, None])[i]
+    return auto if value is None else value
+
+
+def render(spec, filename, output):
+    """ Draws the plot described by spec for filename into output """
+    view = engine.DataView(load(spec, filename))
+    xname = spec.get('x') or None
+
+    fig = Figure(tuple(spec.get('size', (8, 6))), dpi=spec.get('dpi', 100))
+    FigureCanvasAgg(fig)
+    axes = fig.add_subplot(111)
+
+    xdata = view.xdata(xname)
+    xmin = limit(spec, 'xlim', 0, 0)
+    xmax = limit(spec, 'xlim', 1, view.auto_xmax(xname))
+    ymin = limit(spec, 'ylim', 0, 0)
+    ymax = limit(spec, 'ylim', 1, 1000)
+    axes.set_xlim(xmin, xmax)
+    axes.set_ylim(ymin, ymax)
+
+    width = int(fig.get_figwidth() * fig.dpi)
+    for name in spec.get('y', []):
+        axes.plot(*view.series(xname, name, xmin, xmax, width), label=name)
+
+    if spec.get('id') and spec.get('ids'):
+        index = view.category_index(spec['id'])
+        for label in spec['ids']:
+            value = label.encode('utf-8') if index.categories.dtype.kind == 'S' else label
+            code = index.code_of(value)
+            if code < 0:
+                continue
+            xs = xdata[index.rows(code)]
+            axes.plot(xs, np.full(len(xs), ymax / 2.), '+', label=label)
+
+    axes.grid(spec.get('grid', True), color='gray')
+    axes.set_title(os.path.basename(filename) if spec.get('title') else "", size=12)
+    axes.set_facecolor('black' if spec.get('background', True) else 'white')
+    for label in axes.get_xticklabels():
+        label.set_fontsize(8)
+        label.set_visible(spec.get('xticklabels', True))
+    for label in axes.get_yticklabels():
+        label.set_fontsize(8)
+    if axes.get_legend_handles_labels()[0]:
+        axes.legend(bbox_to_anchor=(1., 1), loc=2, borderaxespad=0., prop={'size': 8})
+    axes.set_xlabel(spec.get('xlabel', ""))
+    axes.set_ylabel(spec.get('ylabel', ""))
+
+    fig.savefig(output, dpi=fig.dpi, bbox_inches='tight')
+    return len(view.data)
+
+
+def render_job(job):
+    """ Pool worker: returns (filename, output, rows, seconds, error) """
+    spec, filename, output = job
+    start = time.time()
+    try:
+        rows = render(spec, filename, output)
+    except Exception as e:
+        return filename, output, 0, time.time() - start, "%s: %s" % (type(e).__name__, e)
+    return filename, output, rows, time.time() - start, None
+
+
+def output_path(filename, outdir):
+    base = os.path.basename(filename)
+    ext = compressed.extension(base)
+    if ext:
+        base = base[:-len(ext)]
+    base = os.path.splitext(base)[0] + '.png'
+    return os.path.join(outdir or os.path.dirname(os.path.abspath(filename)), base)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render csv files to PNG from a plot spec")
+    parser.add_argument('spec', help='JSON plot spec')
+    parser.add_argument('files', nargs='+', help='csv files')
+    parser.add_argument('-o', '--outdir', help='output directory (default: next to each csv)')
+    parser.add_argument('-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+                        help='worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    if args.outdir and not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+
+    jobs = [(spec, filename, output_path(filename, args.outdir)) for filename in args.files]
+    start = time.time()
+    failed = 0
+    if args.jobs > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(args.jobs, len(jobs)))
+        results = pool.imap_unordered(render_job, jobs)
+    else:
+        pool = None
+        results = (render_job(job) for job in jobs)
+    try:
+        for filename, output, rows, seconds, error in results:
+            if error:
+                failed += 1
+                print("FAILED %s: %s" % (filename, error))
+            else:
+                print("%s -> %s (%d rows, %.2fs)" % (filename, output, rows, seconds))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    elapsed = time.time() - start
+    print("%d files in %.2fs, %.2f files/s, %d failed" % (
+        len(jobs), elapsed, len(jobs) / max(elapsed, 1e-9), failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
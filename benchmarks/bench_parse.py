@@ -0,0 +1,65 @@
+"""
+
+Throughput benchmark: csvparse against the np.loadtxt load path.
+Writes a synthetic wide csv (unless --file is given) and reports MB/s for
+loadtxt and for csvparse with an increasing number of processes.
+
+    python benchmarks/bench_parse.py --rows 200000 --cols 40 --procs 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import csvparse
+import synth
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--cols', type=int, default=40)
+    parser.add_argument('--procs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--file', help='existing csv with a Float, a String and then Float columns')
+    parser.add_argument('--skip-loadtxt', action='store_true')
+    args = parser.parse_args()
+
+    filename = args.file
+    if filename is None:
+        fd, filename = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        synth.generate(filename, args.rows, 'string,float*%d' % (args.cols - 2))
+    try:
+        with open(filename) as f:
+            cols = len(f.readline().split(','))
+        dt, categories = csvparse.make_dtype([('t', 'Float'), ('s', 'String')] +
+                                             [('c%d' % c, 'Float') for c in range(2, cols)])
+        mb = os.path.getsize(filename) / 1e6
+        print("%s: %.1f MB, %d columns" % (filename, mb, cols))
+
+        base = None
+        if not args.skip_loadtxt:
+            base, data = timed(lambda: np.loadtxt(filename, dt, delimiter=',', skiprows=1))
+            print("%-16s %8.2fs %8.1f MB/s" % ('loadtxt', base, mb / base))
+        for procs in args.procs:
+            elapsed, data = timed(lambda: csvparse.parse_file(filename, dt, processes=procs))
+            speedup = " %6.1fx" % (base / elapsed) if base else ""
+            print("%-16s %8.2fs %8.1f MB/s%s" % ('csvparse -j%d' % procs, elapsed, mb / elapsed, speedup))
+    finally:
+        if args.file is None:
+            os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
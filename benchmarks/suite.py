@@ -0,0 +1,203 @@
+"""
+
+Benchmark suite for the data analysis gui.
+Times the main paths on synthetic files from synth.py: loading, type
+inference, unique ID extraction, marker selection and off-screen Agg
+rendering. Each case runs in its own process so its peak RSS can be
+recorded. Results are written as JSON and two result files can be
+compared.
+
+    python benchmarks/suite.py run --rows 10000 100000 1000000 -o results.json
+    python benchmarks/suite.py compare before.json after.json
+
+License: this code is in the public domain
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+sys.path.insert(0, HERE)
+
+import synth
+
+
+DATA_DIR = os.path.join(HERE, 'data')
+SELECTED_IDS = 100
+STAGES = ('load', 'infer', 'unique_ids', 'marker_select', 'render')
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss / 1e6
+    return rss / 1e3
+
+
+def timed(results, stage, func, *args):
+    start = time.time()
+    value = func(*args)
+    results[stage] = time.time() - start
+    return value
+
+
+def render(view, yname, width=800, height=600):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure((width / 100., height / 100.), dpi=100)
+    canvas = FigureCanvasAgg(fig)
+    axes = fig.add_subplot(111)
+    xmax = view.auto_xmax('t')
+    axes.set_xlim(0, xmax)
+    axes.plot(*view.series('t', yname, 0, xmax, width))
+    canvas.draw()
+
+
+def run_case(case):
+    """ Runs every stage of one case in this process """
+    import numpy as np
+    import engine
+    # Import time is not part of any stage
+    import matplotlib.figure
+    import matplotlib.backends.backend_agg
+    import catindex
+    import csvparse
+    import infer
+    import lod
+
+    filename = synth.cached(case['data_dir'], case['rows'], case['mix'], case['ids'], case['seed'])
+    columns = synth.columns_for(case['mix'])
+    stages = {}
+    data = timed(stages, 'load', engine.load, filename, columns, case['processes'])
+    timed(stages, 'infer', engine.infer_columns, filename)
+    view = engine.DataView(data)
+
+    ids = [name for name, fmt in columns if fmt == 'Category']
+    if ids:
+        index = timed(stages, 'unique_ids', view.category_index, ids[0])
+        codes = np.linspace(0, len(index) - 1, min(SELECTED_IDS, len(index))).astype(int)
+        xdata = view.xdata('t')
+        timed(stages, 'marker_select', lambda: [xdata[index.rows(code)] for code in codes])
+
+    ys = [name for name, fmt in columns if fmt == 'Float' and name != 't']
+    if ys:
+        timed(stages, 'render', render, view, ys[0])
+
+    return {'case': dict((k, case[k]) for k in ('rows', 'mix', 'ids', 'seed', 'processes')),
+            'file_mb': os.path.getsize(filename) / 1e6,
+            'stages': stages,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def case_key(case):
+    return '%(rows)d|%(mix)s|%(ids)d|%(seed)d|%(processes)s' % case
+
+
+def meta():
+    import numpy
+    import matplotlib
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                         stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit,
+            'python': platform.python_version(), 'numpy': numpy.__version__,
+            'matplotlib': matplotlib.__version__, 'platform': platform.platform(),
+            'cpu_count': multiprocessing.cpu_count()}
+
+
+def run(args):
+    results = []
+    for rows in args.rows:
+        for repeat in range(args.repeat):
+            case = {'rows': int(rows), 'mix': args.mix, 'ids': args.ids, 'seed': args.seed,
+                    'processes': args.processes, 'data_dir': args.data_dir}
+            # Generate outside the timed process so the child only measures
+            synth.cached(args.data_dir, case['rows'], args.mix, args.ids, args.seed)
+            out = subprocess.check_output([sys.executable, os.path.abspath(__file__), 'case',
+                                           json.dumps(case)])
+            result = json.loads(out.decode())
+            results.append(result)
+            print("%-10d %s  rss %.0f MB" % (case['rows'], '  '.join(
+                '%s %.3fs' % (stage, result['stages'][stage])
+                for stage in STAGES if stage in result['stages']), result['peak_rss_mb'] or 0))
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta(), 'results': results}, f, indent=1)
+    print("Wrote %s" % args.output)
+
+
+def best(results):
+    """ Fastest time per stage and lowest RSS for every case key """
+    out = {}
+    for result in results:
+        key = case_key(result['case'])
+        entry = out.setdefault(key, {'stages': {}, 'peak_rss_mb': None})
+        for stage, seconds in result['stages'].items():
+            entry['stages'][stage] = min(seconds, entry['stages'].get(stage, seconds))
+        if result['peak_rss_mb'] is not None:
+            entry['peak_rss_mb'] = min(result['peak_rss_mb'], entry['peak_rss_mb'] or result['peak_rss_mb'])
+    return out
+
+
+def compare(args):
+    with open(args.before) as f:
+        before = best(json.load(f)['results'])
+    with open(args.after) as f:
+        after = best(json.load(f)['results'])
+    for key in sorted(set(before) & set(after)):
+        print(key)
+        for stage in STAGES + ('peak_rss_mb',):
+            if stage == 'peak_rss_mb':
+                a, b = before[key][stage], after[key][stage]
+            else:
+                a, b = before[key]['stages'].get(stage), after[key]['stages'].get(stage)
+            if not a or not b:
+                continue
+            change = b / a - 1
+            flag = '  <<' if change > args.threshold else ('  >>' if change < -args.threshold else '')
+            print("  %-14s %10.3f %10.3f %+7.1f%%%s" % (stage, a, b, 100 * change, flag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the data analysis gui")
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('run', help='run the benchmarks')
+    p.add_argument('--rows', type=float, nargs='+', default=[1e4, 1e5, 1e6])
+    p.add_argument('--mix', default=synth.DEFAULT_MIX)
+    p.add_argument('--ids', type=int, default=1000)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--processes', type=int, default=None, help='parser processes (default: one per core)')
+    p.add_argument('--repeat', type=int, default=1)
+    p.add_argument('--data-dir', default=DATA_DIR)
+    p.add_argument('-o', '--output', default='bench_results.json')
+    p = sub.add_parser('compare', help='compare two result files')
+    p.add_argument('before')
+    p.add_argument('after')
+    p.add_argument('--threshold', type=float, default=0.1, help='relative change to flag')
+    p = sub.add_parser('case')
+    p.add_argument('case')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    elif args.command == 'case':
+        sys.stdout.write(json.dumps(run_case(json.loads(args.case))))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+
+Deterministic synthetic csv generator for the benchmarks.
+The same arguments always give the same file. The first column 't' is a
+monotonic time axis, the rest follow a type mix such as
+
+    id,float*8,int,bool,timestamp,string,quoted
+
+where id is a Category column drawing from `ids` distinct values and
+quoted is a string column with commas inside quotes.
+
+    python benchmarks/synth.py out.csv --rows 1000000 --mix id,float*8 --ids 1000
+
+License: this code is in the public domain
+"""
+import argparse
+import os
+
+import numpy as np
+
+
+DEFAULT_MIX = 'id,float*8,int,bool,timestamp'
+BLOCK_ROWS = 100000
+
+FORMATS = {'id': 'Category', 'float': 'Float', 'int': 'Int', 'bool': 'Bool',
+           'timestamp': 'Timestamp', 'string': 'String', 'quoted': 'String'}
+
+
+def parse_mix(mix):
+    """ 'id,float*2' -> ['id', 'float', 'float'] """
+    kinds = []
+    for token in mix.split(','):
+        kind, _, count = token.strip().partition('*')
+        if kind not in FORMATS:
+            raise ValueError("Unknown column type %r in mix, expected one of %s"
+                             % (kind, ', '.join(sorted(FORMATS))))
+        kinds.extend([kind] * int(count or 1))
+    return kinds
+
+
+def columns_for(mix):
+    """ (name, format) of every column of a file made with mix """
+    columns = [('t', 'Float')]
+    for i, kind in enumerate(parse_mix(mix)):
+        columns.append(('%s%d' % (kind, i), FORMATS[kind]))
+    return columns
+
+
+def _block(kind, rng, start, n, ids):
+    if kind == 'id':
+        return np.char.mod('id%06d', rng.randint(0, ids, n))
+    if kind == 'float':
+        return np.char.mod('%.5g', rng.randn(n) * 100)
+    if kind == 'int':
+        return np.char.mod('%d', rng.randint(0, 1000000, n))
+    if kind == 'bool':
+        return np.where(rng.rand(n) < 0.5, 'true', 'false')
+    if kind == 'timestamp':
+        base = np.datetime64('2013-06-20T00:00:00', 's')
+        return np.datetime_as_string(base + np.arange(start, start + n), unit='s')
+    if kind == 'string':
+        return np.char.mod('s%x', rng.randint(0, 2 ** 31 - 1, n))
+    return np.char.mod('"q%d,x"', rng.randint(0, ids, n))
+
+
+def generate(filename, rows, mix=DEFAULT_MIX, ids=1000, seed=0):
+    """ Writes the file and returns its (name, format) columns """
+    columns = columns_for(mix)
+    kinds = parse_mix(mix)
+    rng = np.random.RandomState(seed)
+    with open(filename, 'w') as f:
+        f.write(','.join(name for name, fmt in columns) + '\n')
+        for start in range(0, rows, BLOCK_ROWS):
+            n = min(BLOCK_ROWS, rows - start)
+            block = [np.char.mod('%.3f', (start + np.arange(n)) * 0.001)]
+            block.extend(_block(kind, rng, start, n, ids) for kind in kinds)
+            f.writelines(','.join(row) + '\n' for row in zip(*[b.tolist() for b in block]))
+    return columns
+
+
+def cached(directory, rows, mix=DEFAULT_MIX, ids=1000, seed=0):
+    """ Path of the generated file in directory, generating it if missing """
+    name = 'synth_%d_%s_%d_%d.csv' % (rows, mix.replace(',', '-').replace('*', 'x'), ids, seed)
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        generate(path + '.tmp', rows, mix, ids, seed)
+        os.rename(path + '.tmp', path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic csv file")
+    parser.add_argument('filename')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--ids', type=int, default=1000, help='distinct values of id columns')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name, fmt in generate(args.filename, args.rows, args.mix, args.ids, args.seed):
+        print("%s,%s" % (name, fmt))
+
+
+if __name__ == '__main__':
+    main()
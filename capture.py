@@ -6,6 +6,9 @@ License: this code is in the public domain
 
 Last modified: 20.06.2013
 """
+import time
+START_TIME = time.time()
+
 import os
 import pprint
 import random
@@ -13,14 +16,20 @@ import sys
 import wx
 
 import csv
-import matplotlib
-matplotlib.use('WXAgg')
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_wxagg import \
-    FigureCanvasWxAgg as FigCanvas, \
-    NavigationToolbar2WxAgg as NavigationToolbar
 import numpy as np
-import pylab
+
+import colcache
+import columnar
+import compressed
+import csvparse
+import density
+import engine
+import groupby
+import layer
+import listmodel
+import perf
+import rowfilter
+import tail
 
 
 class PopUpBox(wx.Frame):
@@ -39,15 +48,54 @@ class PopUpBox(wx.Frame):
         
     
 
+FOLLOW_POLL_MS = 100
+FOLLOW_MAX_FPS = 5
+REDRAW_DELAY_MS = 50
+REDRAW_MAX_WAIT_MS = 250
+DENSITY_CMAPS = ('viridis', 'magma', 'plasma', 'inferno')
+# IDs named in the legend when their groups are drawn as collections
+LEGEND_IDS = 20
+
+
+class RedrawScheduler(object):
+    """ Coalesces redraw requests. request() may be called any number of
+        times; callback then runs once, delay_ms after the last request but
+        no later than about max_wait_ms after the first, so steady input
+        still redraws now and then.
+    """
+    def __init__(self, window, callback, delay_ms=REDRAW_DELAY_MS, max_wait_ms=REDRAW_MAX_WAIT_MS):
+        self.callback = callback
+        self.delay_ms = delay_ms
+        self.max_wait_ms = max_wait_ms
+        self.first = None
+        self.timer = wx.Timer(window)
+        window.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+
+    def request(self):
+        now = time.time()
+        if self.first is None:
+            self.first = now
+            self.timer.Start(self.delay_ms, oneShot=True)
+        elif 1000 * (now - self.first) + self.delay_ms <= self.max_wait_ms:
+            self.timer.Start(self.delay_ms, oneShot=True)
+
+    def on_timer(self, event):
+        self.first = None
+        self.callback()
+
+
 class BoundControlBox(wx.Panel):
     """ A static box with a couple of radio buttons and a text
         box. Allows to switch between an automatic mode and a 
         manual mode with an associated value.
     """
-    def __init__(self, parent, ID, label, initval):
+    def __init__(self, parent, ID, label, initval, on_change=None):
         wx.Panel.__init__(self, parent, ID)
         
-        self.value = initval
+        # Last manual value that was a number
+        self.value = float(initval)
+        self.state = (False, str(initval))
+        self.on_change = on_change
         
         box = wx.StaticBox(self, -1, label)
         sizer = wx.StaticBoxSizer(box, wx.HORIZONTAL)
@@ -69,16 +117,103 @@ class BoundControlBox(wx.Panel):
         sizer.Fit(self)
     
     def on_update_manual_text(self, event):
-        self.manual_text.Enable(self.radio_manual.GetValue())
-        self.value = self.manual_text.GetValue()
+        """ Runs on every update ui event; calls on_change only when the
+            mode or the manual value changed, and not while the text is
+            not a number (empty, or a lone '-' being typed)
+        """
+        manual = self.radio_manual.GetValue()
+        if manual != self.manual_text.IsEnabled():
+            self.manual_text.Enable(manual)
+        state = (manual, self.manual_text.GetValue())
+        if state != self.state:
+            self.state = state
+            try:
+                self.value = float(state[1])
+            except ValueError:
+                if manual:
+                    return
+            if self.on_change is not None:
+                self.on_change()
     
     def is_auto(self):
         return self.radio_auto.GetValue()
         
     def manual_value(self):
+        """ The manual value, as last typed in as a number """
         return self.value
 
 
+class VirtualList(wx.ListCtrl):
+    """ A report list drawing its rows from a ListModel on demand, so
+        filling it costs only the rows on screen. Clicking a heading sorts
+        by that column, clicking it again reverses the order. on_select is
+        called after the selection changed.
+    """
+    def __init__(self, parent, headings, model, on_select=None):
+        wx.ListCtrl.__init__(self, parent, -1, style=wx.LC_REPORT | wx.LC_VIRTUAL)
+        for col, heading in enumerate(headings):
+            self.InsertColumn(col, heading)
+        self.model = model
+        self.on_select = on_select
+        self.syncing = False
+        self.sync_pending = False
+        self.Bind(wx.EVT_LIST_COL_CLICK, self.on_col_click)
+        self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_selection)
+        self.Bind(wx.EVT_LIST_ITEM_DESELECTED, self.on_selection)
+        self.refresh()
+
+    def OnGetItemText(self, row, col):
+        return self.model.text(row, col)
+
+    def refresh(self):
+        """ Shows the model after its items, filter or order changed """
+        self.syncing = True
+        self.SetItemCount(len(self.model))
+        row = self.GetFirstSelected()
+        while row != -1:
+            self.Select(row, False)
+            row = self.GetNextSelected(row)
+        for row in self.model.selected_rows():
+            self.Select(int(row))
+        self.syncing = False
+        self.Refresh()
+
+    def filter(self, pattern):
+        self.model.filter(pattern)
+        self.refresh()
+
+    def focused_item(self):
+        """ Model item of the focused row, or -1 """
+        row = self.GetFocusedItem()
+        if row < 0 or row >= len(self.model):
+            return -1
+        return self.model.item(row)
+
+    def on_col_click(self, event):
+        col = event.GetColumn()
+        self.model.sort(col, descending=col == self.model.sort_col and not self.model.descending)
+        self.refresh()
+
+    def on_selection(self, event):
+        # Range selections send one event per row on some platforms, so
+        # the selection is read back once they have all arrived
+        if not self.syncing and not self.sync_pending:
+            self.sync_pending = True
+            wx.CallAfter(self.sync_selection)
+        event.Skip()
+
+    def sync_selection(self):
+        self.sync_pending = False
+        rows = []
+        row = self.GetFirstSelected()
+        while row != -1:
+            rows.append(row)
+            row = self.GetNextSelected(row)
+        self.model.set_selected_rows(rows)
+        if self.on_select is not None:
+            self.on_select()
+
+
 class GraphFrame(wx.Frame):
     """ The main frame of the application
     """
@@ -88,9 +223,44 @@ class GraphFrame(wx.Frame):
         
         self.filename =None
         self.data = []
+        self.loader = None
+        self.data_end = None
+        self.follower = None
+        self.follow_window = None
+        self.follow_pending = False
+        self.last_follow_draw = 0
+        self.cache = colcache.ColumnCache()
+        self.data_view = None
+        self.canvas = None
+        self.lines = {}
+        self.id_lines = {}
+        # Empty lines that only name the grouped IDs in the legend
+        self.id_proxies = {}
+        self.density_images = {}
+        self.density_keys = {}
+        self.legend_labels = []
+        self.plotted_data = None
+        self.xname = None
+        self.xdata = np.arange(0)
+        self.style = None
+        self.background = None
+        self.printing = False
+        self.id_groups = None
+        self.id_groups_key = None
+        self.row_filter = None
+        self.plotted_filter = None
+        self.lines_version = 0
+        self.layer_key = None
+        self.pending_layer_key = None
+        self.layer_image = None
+        self.render_generation = 0
+        self.renderer = layer.LayerRenderer(
+            lambda generation, image: wx.CallAfter(self.on_layer_rendered, generation, image))
+        self.redraw = RedrawScheduler(self, self.draw_plot)
+        self.restyle = RedrawScheduler(self, self.redraw_style)
 
         self.format="String"
-        self.formats_list={'String':'S100','Int': np.int,'Float' : np.float}
+        self.formats_list=csvparse.FORMATS
         
         self.xaxis=None
         self.yaxis = []
@@ -102,8 +272,10 @@ class GraphFrame(wx.Frame):
 
               
         self.create_menu()
+        self.create_follow_timer()
         self.create_status_bar()
         self.create_main_panel()
+        wx.CallAfter(self.create_canvas)
 
 
     def create_menu(self):
@@ -111,8 +283,22 @@ class GraphFrame(wx.Frame):
         menu_file = wx.Menu()
         m_open = menu_file.Append(-1,"&Open data\tCtrl-O","Open data")
         self.Bind(wx.EVT_MENU, self.on_open_data,m_open)
+        m_open_dir = menu_file.Append(-1, "Open column d&irectory...", "Open a directory of .npy column files")
+        self.Bind(wx.EVT_MENU, self.on_open_column_dir, m_open_dir)
+        m_export = menu_file.Append(-1, "&Export loaded data...", "Write the loaded columns to a binary file for fast reopening")
+        self.Bind(wx.EVT_MENU, self.on_export_data, m_export)
         m_expt = menu_file.Append(-1, "&Save plot\tCtrl-S", "Save plot to file")
         self.Bind(wx.EVT_MENU, self.on_save_plot, m_expt)
+        self.m_cancel = menu_file.Append(-1, "&Cancel load\tCtrl-K", "Stop loading the data file")
+        self.Bind(wx.EVT_MENU, self.on_cancel_load, self.m_cancel)
+        self.m_cancel.Enable(False)
+        self.m_cache = menu_file.AppendCheckItem(-1, "Use column cac&he", "Keep loaded columns on disk for fast reopening")
+        self.m_cache.Check(True)
+        self.m_lazy = menu_file.AppendCheckItem(-1, "&Lazy columns", "Index the file and parse only the columns that are used")
+        self.m_follow = menu_file.AppendCheckItem(-1, "&Follow file\tCtrl-F", "Keep reading lines appended to the data file")
+        self.Bind(wx.EVT_MENU, self.on_follow, self.m_follow)
+        m_window = menu_file.Append(-1, "Rolling &window...", "Keep only the last rows while following")
+        self.Bind(wx.EVT_MENU, self.on_rolling_window, m_window)
         menu_file.AppendSeparator()
         m_exit = menu_file.Append(-1, "E&xit\tCtrl-X", "Exit")
         self.Bind(wx.EVT_MENU, self.on_exit, m_exit)
@@ -120,6 +306,8 @@ class GraphFrame(wx.Frame):
         menu_edit = wx.Menu()
         m_label = menu_edit.Append(-1, "Edit Labels","Edit Labels")
         self.Bind(wx.EVT_MENU, self.on_edit_label, m_label)
+        m_perf = menu_edit.Append(-1, "&Performance...", "Show the time spent in each stage")
+        self.Bind(wx.EVT_MENU, self.on_performance, m_perf)
 
                 
         self.menubar.Append(menu_file, "&File")
@@ -130,14 +318,12 @@ class GraphFrame(wx.Frame):
     def create_main_panel(self):
         self.panel = wx.Panel(self, -1, style=wx.SIMPLE_BORDER)
 
-        self.init_plot()
-        
-        self.canvas = FigCanvas(self.panel, -1, self.fig)
+        self.canvas_holder = wx.Panel(self.panel, -1, size=(300, 300))
 
-        self.xmin_control = BoundControlBox(self.panel, -1, "X min", 0)
-        self.xmax_control = BoundControlBox(self.panel, -1, "X max", 1000)
-        self.ymin_control = BoundControlBox(self.panel, -1, "Y min", 0)
-        self.ymax_control = BoundControlBox(self.panel, -1, "Y max", 1000)
+        self.xmin_control = BoundControlBox(self.panel, -1, "X min", 0, self.on_bounds_changed)
+        self.xmax_control = BoundControlBox(self.panel, -1, "X max", 1000, self.on_bounds_changed)
+        self.ymin_control = BoundControlBox(self.panel, -1, "Y min", 0, self.on_bounds_changed)
+        self.ymax_control = BoundControlBox(self.panel, -1, "Y max", 1000, self.on_bounds_changed)
               
         self.plot_button = wx.Button(self.panel, -1, "Plot")
         self.Bind(wx.EVT_BUTTON, self.OnPlot, self.plot_button)
@@ -175,17 +361,26 @@ class GraphFrame(wx.Frame):
         self.hbox2.Add(self.ymin_control, border=5, flag=wx.ALL)
         self.hbox2.Add(self.ymax_control, border=5, flag=wx.ALL)
         
-        self.lc = wx.ListCtrl(self.panel, -1, style=wx.LC_REPORT)
-        self.lc.InsertColumn(0, 'Parameter')
-        self.lc.InsertColumn(1, 'Format')
-        self.lc.InsertColumn(2, 'Plot')
-        
-        self.lc1 = wx.ListCtrl(self.panel, -1, style=wx.LC_REPORT)
-        self.lc1.InsertColumn(0, 'IDs')
-        
+        self.lc = VirtualList(self.panel, ['Parameter', 'Format', 'Plot', 'Confidence'],
+                              listmodel.ListModel(*[np.array([], dtype=object)] * 4))
+        self.lc1 = VirtualList(self.panel, ['IDs', 'Count'],
+                               listmodel.ListModel(np.array([]), np.array([], dtype=int), np.array([], dtype=int)),
+                               on_select=self.OnSelectID)
+
+        self.lc_filter = wx.TextCtrl(self.panel, -1)
+        self.lc_filter.Bind(wx.EVT_TEXT, lambda event: self.lc.filter(self.lc_filter.GetValue()))
+        self.lc1_filter = wx.TextCtrl(self.panel, -1)
+        self.lc1_filter.Bind(wx.EVT_TEXT, lambda event: self.lc1.filter(self.lc1_filter.GetValue()))
+
         self.hbox3 = wx.BoxSizer(wx.HORIZONTAL)
-        self.hbox3.Add(self.lc,1, wx.ALIGN_LEFT |wx.ALIGN_CENTER_VERTICAL,2)
-        self.hbox3.Add(self.lc1,1, wx.ALIGN_LEFT |wx.ALIGN_CENTER_VERTICAL,2)
+        for lc, lc_filter in ((self.lc, self.lc_filter), (self.lc1, self.lc1_filter)):
+            box = wx.BoxSizer(wx.VERTICAL)
+            filter_box = wx.BoxSizer(wx.HORIZONTAL)
+            filter_box.Add(wx.StaticText(self.panel, -1, 'Filter: '), flag=wx.ALIGN_CENTER_VERTICAL)
+            filter_box.Add(lc_filter, 1, flag=wx.ALIGN_CENTER_VERTICAL)
+            box.Add(filter_box, 0, flag=wx.EXPAND)
+            box.Add(lc, 1, flag=wx.EXPAND)
+            self.hbox3.Add(box, 1, wx.EXPAND | wx.ALL, 2)
         
         self.hbox4 = wx.BoxSizer(wx.HORIZONTAL)      
         self.hbox4.AddSpacer(20)
@@ -193,17 +388,32 @@ class GraphFrame(wx.Frame):
         self.hbox4.Add(wx.Button(self.panel, 14, 'X axis'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         self.hbox4.Add(wx.Button(self.panel, 15, 'Y axis'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         self.hbox4.Add(wx.Button(self.panel, 16, 'Find ID'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        self.id_mode = wx.Choice(self.panel, -1, choices=list(groupby.MODES))
+        self.id_mode.SetSelection(0)
+        self.Bind(wx.EVT_CHOICE, self.on_id_mode, self.id_mode)
+        self.hbox4.Add(wx.StaticText(self.panel, -1, 'IDs as: '), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        self.hbox4.Add(self.id_mode, border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        self.y_mode = wx.Choice(self.panel, -1, choices=list(density.MODES))
+        self.y_mode.SetSelection(0)
+        self.Bind(wx.EVT_CHOICE, self.on_y_mode, self.y_mode)
+        self.hbox4.Add(wx.StaticText(self.panel, -1, 'Y as: '), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        self.hbox4.Add(self.y_mode, border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         self.hbox4.Add(self.plot_button, border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)       
 
+        self.row_filter_text = wx.TextCtrl(self.panel, -1, size=(300, -1), style=wx.TE_PROCESS_ENTER)
+        self.row_filter_text.SetToolTipString("Rows to plot, e.g. temp > 50 and status == 'OK'. Press Enter to apply.")
+        self.Bind(wx.EVT_TEXT_ENTER, self.on_row_filter, self.row_filter_text)
+        self.hbox4.Add(wx.StaticText(self.panel, -1, 'Rows where: '), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        self.hbox4.Add(self.row_filter_text, border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+
 
         self.Bind (wx.EVT_BUTTON, self.OnXSelect, id=14)
         self.Bind (wx.EVT_BUTTON, self.OnYSelect, id=15)
         self.Bind (wx.EVT_BUTTON, self.OnFindID, id=16)
-        self.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnSelectID, self.lc1)
         
         
         self.vbox = wx.BoxSizer(wx.VERTICAL)
-        self.vbox.Add(self.canvas, 1, flag=wx.LEFT | wx.TOP | wx.GROW)        
+        self.vbox.Add(self.canvas_holder, 1, flag=wx.LEFT | wx.TOP | wx.GROW)        
         self.vbox.Add(self.hbox3, 0, flag=wx.EXPAND | wx.TOP)
         self.vbox.Add(self.hbox4, 0, flag=wx.ALIGN_LEFT | wx.TOP)
         self.vbox.Add(self.hbox2, 0, flag=wx.ALIGN_LEFT | wx.TOP)
@@ -214,11 +424,58 @@ class GraphFrame(wx.Frame):
         self.vbox.Fit(self)
         
                
+    def create_follow_timer(self):
+        self.follow_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_follow_timer, self.follow_timer)
+
     def create_status_bar(self):
         self.statusbar = self.CreateStatusBar()
+        self.statusbar.SetFieldsCount(3)
+        self.statusbar.SetStatusWidths([-1, 300, 150])
+        self.gauge = wx.Gauge(self.statusbar, -1, 100)
+        self.gauge.Hide()
+        self.statusbar.Bind(wx.EVT_SIZE, self.on_statusbar_size)
+
+    def on_statusbar_size(self, event):
+        rect = self.statusbar.GetFieldRect(2)
+        self.gauge.SetPosition((rect.x + 2, rect.y + 2))
+        self.gauge.SetSize((rect.width - 4, rect.height - 4))
+        event.Skip()
         
 
+    def create_canvas(self):
+        """ Builds the figure, canvas and toolbar once the window is up, as
+            importing matplotlib is most of the startup time
+        """
+        window_ms = 1000 * (time.time() - START_TIME)
+        import matplotlib
+        matplotlib.use('WXAgg')
+        from matplotlib.backends.backend_wxagg import \
+            FigureCanvasWxAgg as FigCanvas, \
+            NavigationToolbar2WxAgg as NavigationToolbar
+
+        self.init_plot()
+        self.layer_image = self.fig.figimage(np.zeros((1, 1, 4)), origin='upper', animated=True)
+
+        self.canvas = FigCanvas(self.panel, -1, self.fig)
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.axes.callbacks.connect('xlim_changed', self.on_xlim_changed)
+        self.toolbar = NavigationToolbar(self.canvas)
+        self.toolbar.Realize()
+
+        canvas_box = wx.BoxSizer(wx.VERTICAL)
+        canvas_box.Add(self.canvas, 1, flag=wx.GROW)
+        canvas_box.Add(self.toolbar, 0, flag=wx.EXPAND)
+        self.vbox.Replace(self.canvas_holder, canvas_box)
+        self.canvas_holder.Destroy()
+        self.panel.Layout()
+
+        self.startup_ms = (window_ms, 1000 * (time.time() - START_TIME))
+        self.flash_status_message("Window up in %d ms, plot ready in %d ms" % self.startup_ms)
+
     def init_plot(self):
+        from matplotlib.figure import Figure
+        from matplotlib.artist import setp
         self.dpi = 100
         self.fig = Figure((3.0, 3.0), dpi=self.dpi)
 
@@ -227,8 +484,8 @@ class GraphFrame(wx.Frame):
         self.axes.set_axis_bgcolor('black')
 
         
-        pylab.setp(self.axes.get_xticklabels(), fontsize=8)
-        pylab.setp(self.axes.get_yticklabels(), fontsize=8)
+        setp(self.axes.get_xticklabels(), fontsize=8)
+        setp(self.axes.get_yticklabels(), fontsize=8)
 
         self.plot_data = self.axes.plot(
             self.data, 
@@ -239,45 +496,248 @@ class GraphFrame(wx.Frame):
 
     def draw_plot(self):
         """ 
-        Draws the plot
+        Draws the plot. The lines are kept between calls: series that were
+        removed are taken off the axes, new ones are added and existing
+        ones only get new data when the data or the X column changed.
         """
         if self.filename == None:
             self.flash_status_message("No file loaded in workspace")
             return
+        if self.canvas is None:
+            return
+
+        if self.loader is not None:
+            self.data = self.loader.snapshot()
 
-        self.axes.clear()
-        
         if(self.xaxis):
-            xdata = self.data[self.lc.GetItem(self.xaxis-1,0).GetText()]
+            xname = self.param_name(self.xaxis-1)
+        else:
+            xname = None
+        if self.is_lazy():
+            # Columns dropped to stay within the memory budget are parsed
+            # again here, with progress and Cancel, not inside the drawing
+            used = [self.param_name(i) for i in self.yaxis]
+            if xname is not None:
+                used.append(xname)
+            if self.id is not None:
+                used.append(self.param_name(self.id))
+            if self.row_filter is not None:
+                used.extend(sorted(self.row_filter.columns))
+            for name in used:
+                if not self.load_column(name):
+                    return
+        xdata = self.view().xdata(xname)
+
+        data_changed = (self.data is not self.plotted_data or xname != self.xname or
+                        self.row_filter is not self.plotted_filter)
+        self.plotted_data = self.data
+        self.plotted_filter = self.row_filter
+        self.xname = xname
+        self.xdata = xdata
+
+        xmin, xmax, ymin, ymax = self.limits()
+        limits_changed = (tuple(self.axes.get_xlim()) != (xmin, xmax) or
+                          tuple(self.axes.get_ylim()) != (ymin, ymax))
+        self.axes.set_xlim(xmin, xmax, emit=False)
+        self.axes.set_ylim(ymin, ymax, emit=False)
+
+        self.lines_version += 1
+        names = [self.param_name(i) for i in self.yaxis]
+        dense = [name for name in names if self.is_density(name)]
+        for name in list(self.lines):
+            if name not in names or name in dense:
+                self.lines.pop(name).remove()
+        for name in list(self.density_images):
+            if name not in dense:
+                self.density_images.pop(name).remove()
+                del self.density_keys[name]
+        for name in names:
+            if name in dense:
+                if name not in self.density_images:
+                    self.density_images[name] = self.axes.imshow(
+                        np.full((1, 1), np.nan), origin='lower', aspect='auto', interpolation='nearest',
+                        cmap=DENSITY_CMAPS[len(self.density_images) % len(DENSITY_CMAPS)], animated=True)
+            elif name not in self.lines:
+                xs, ys = self.series(name, xmin, xmax)
+                self.lines[name] = self.axes.plot(xs, ys, label=name, animated=True)[0]
+            elif data_changed or limits_changed:
+                self.lines[name].set_data(*self.series(name, xmin, xmax))
+
+        self.update_densities()
+
+        ids = []
+        proxies = []
+        mode = self.id_mode.GetStringSelection()
+        if self.id is not None and mode != 'Markers' and names:
+            index = self.view().category_index(self.param_name(self.id))
+            ids, proxies = self.plot_id_groups(index, names[0], mode, xmin, xmax)
+        elif(self.id!=None):
+            index = self.view().category_index(self.param_name(self.id))
+            with perf.stage('marker select'):
+                for code in self.selcted_ids:
+                    label = index.label(code)
+                    ids.append(label)
+                    rows = index.rows(code)
+                    mask = self.view().mask(self.row_filter)
+                    if mask is not None:
+                        rows = rows[mask[rows]]
+                    xs = xdata[rows]
+                    ys = np.empty(len(xs))
+                    ys.fill(ymax/2.)
+                    if label in self.id_lines:
+                        self.id_lines[label].set_data(xs, ys)
+                    else:
+                        self.id_lines[label] = self.axes.plot(xs, ys, '+', label=label, animated=True)[0]
+        for artists, kept in ((self.id_lines, ids), (self.id_proxies, proxies)):
+            for label in list(artists):
+                if label not in kept:
+                    artists.pop(label).remove()
+        if self.is_lazy():
+            shown = names + [xname]
+            if self.id is not None:
+                shown.append(self.param_name(self.id))
+            self.view().retain(shown)
+
+        full = self.apply_style() or limits_changed or self.background is None
+        if names + ids + proxies != self.legend_labels:
+            self.legend_labels = names + ids + proxies
+            self.axes.legend(bbox_to_anchor=(1., 1), loc=2, borderaxespad=0.,prop={'size':8})
+            full = True
+
+        if full:
+            with perf.stage('canvas draw'):
+                self.canvas.draw()
+            if perf.recorder.enabled:
+                self.statusbar.SetStatusText("canvas draw took %.1f ms" % (1000 * perf.recorder.last('canvas draw')), 0)
+        else:
+            self.render_lines()
+
+    def plot_id_groups(self, index, yname, mode, xmin, xmax):
+        """ Draws column yname of every selected ID as one collection of
+            lines, plus one of min/max polygons for Envelope. Returns the
+            labels of the collections and those of their legend entries.
+        """
+        from matplotlib import cm
+        from matplotlib.collections import LineCollection, PolyCollection
+        bins = max(int(self.axes.bbox.width), 100)
+        key = (self.view(), index, yname, self.row_filter, tuple(self.selcted_ids), xmin, xmax, bins)
+        if key != self.id_groups_key:
+            y = self.view().filtered(yname, self.row_filter)
+            with perf.stage('group by'):
+                self.id_groups = groupby.GroupBins(index, self.selcted_ids, self.xdata, y,
+                                                   xmin, xmax, bins, self.view().is_monotonic(self.xname))
+            self.id_groups_key = key
+        groups = self.id_groups
+        colors = cm.jet(np.linspace(0, 1, max(len(groups), 1)))
+
+        # The collections are left out of the legend, which instead gets an
+        # empty line per ID in its colour, up to LEGEND_IDS of them
+        label = "_%s by %s (%s)" % (yname, self.param_name(self.id), mode)
+        labels = [label]
+        proxies = []
+        lines = groups.lines('Mean' if mode == 'Envelope' else mode)
+        if label in self.id_lines:
+            self.id_lines[label].set_segments(lines)
+            self.id_lines[label].set_color(colors)
+        else:
+            self.id_lines[label] = LineCollection(lines, colors=colors, label=label, animated=True)
+            self.axes.add_collection(self.id_lines[label])
+        shown = min(len(groups), LEGEND_IDS)
+        for i in range(shown):
+            proxies.append(self.id_proxy(index.label(groups.codes[i]), colors[i]))
+        if len(groups) > shown:
+            proxies.append(self.id_proxy("(%d more IDs)" % (len(groups) - shown), 'none'))
+        if mode == 'Envelope':
+            label = "_%s min/max" % yname
+            labels.append(label)
+            if label in self.id_lines:
+                self.id_lines[label].set_verts(groups.envelopes())
+                self.id_lines[label].set_facecolor(colors)
+            else:
+                self.id_lines[label] = PolyCollection(groups.envelopes(), facecolors=colors, alpha=0.3,
+                                                      edgecolors='none', label=label, animated=True)
+                self.axes.add_collection(self.id_lines[label])
+        return labels, proxies
+
+    def id_proxy(self, label, color):
+        """ An empty line of the given colour that only shows label in the
+            legend. Returns the label.
+        """
+        if label in self.id_proxies:
+            self.id_proxies[label].set_color(color)
         else:
-            xdata= np.arange(len(self.data))
+            self.id_proxies[label] = self.axes.plot([], [], '-', color=color, label=label, animated=True)[0]
+        return label
+
+    def is_density(self, name):
+        """ True if column name is drawn as a density image: when chosen,
+            or for Auto when X is not sorted and there are many rows
+        """
+        mode = self.y_mode.GetStringSelection()
+        if mode == 'Lines' or not density.can_bin(self.data[name]):
+            return False
+        if self.xname is not None and not density.can_bin(self.data[self.xname]):
+            return False
+        if mode == 'Auto':
+            return len(self.data) >= density.AUTO_ROWS and not self.view().is_monotonic(self.xname)
+        return True
 
+    def update_densities(self):
+        """ Counts the rows of every density image per pixel of the axes as
+            they are now, unless that was done for the same view and data
+        """
+        xlim, ylim = self.axes.get_xlim(), self.axes.get_ylim()
+        bbox = self.axes.bbox
+        width, height = max(int(bbox.width), 1), max(int(bbox.height), 1)
+        how = density.SHADES.get(self.y_mode.GetStringSelection(), 'log')
+        key = (tuple(xlim), tuple(ylim), width, height, self.lines_version, how)
+        for name, image in self.density_images.items():
+            if self.density_keys.get(name) == key:
+                continue
+            counts = self.view().density(self.xname, name, xlim[0], xlim[1], ylim[0], ylim[1],
+                                         width, height, self.row_filter)
+            values = density.shade(counts, how)
+            image.set_data(values)
+            image.set_extent(tuple(xlim) + tuple(ylim))
+            if counts.any():
+                image.set_clim(np.nanmin(values), np.nanmax(values))
+            self.density_keys[name] = key
 
+    def limits(self):
+        """ Returns xmin, xmax, ymin, ymax from the bound controls """
         if self.xmax_control.is_auto():
-            xmax = np.max(xdata) 
+            xmax = self.view().auto_xmax(self.xname)
         else:
-            xmax = int(self.xmax_control.manual_value())
+            xmax = self.xmax_control.manual_value()
             
         if self.xmin_control.is_auto():            
             xmin =  0;
         else:
-            xmin = int(self.xmin_control.manual_value())
+            xmin = self.xmin_control.manual_value()
 
 
         if self.ymin_control.is_auto():
             ymin = 0
         else:
-            ymin = int(self.ymin_control.manual_value())
+            ymin = self.ymin_control.manual_value()
         
         if self.ymax_control.is_auto():
             ymax = 1000
         else:
-            ymax = int(self.ymax_control.manual_value())
+            ymax = self.ymax_control.manual_value()
+        return xmin, xmax, ymin, ymax
 
-        self.axes.set_xlim(xmin, xmax)
-        self.axes.set_ylim(ymin, ymax)
+    def apply_style(self):
+        """ Applies the checkbox and label settings to the axes. Returns
+            True if anything changed.
+        """
+        from matplotlib.artist import setp
+        style = (self.cb_grid.IsChecked(), self.cb_title.IsChecked(), self.cb_bg.IsChecked(),
+                 self.cb_xlab.IsChecked(), self.filename, self.xlabel, self.ylabel)
+        if style == self.style:
+            return False
+        self.style = style
 
-        
         if self.cb_grid.IsChecked():
             self.axes.grid(True, color='gray')
         else:
@@ -293,25 +753,105 @@ class GraphFrame(wx.Frame):
         else:
             self.axes.set_axis_bgcolor('white')
 
-        pylab.setp(self.axes.get_xticklabels(), visible=self.cb_xlab.IsChecked())
-        
-
-        for i in xrange(len(self.yaxis)):
-            self.axes.plot(xdata, self.data[self.lc.GetItem(self.yaxis[i],0).GetText()],label=self.lc.GetItem(self.yaxis[i],0).GetText())
-        
-
-        if(self.id!=None):
-            for i in self.selcted_ids:
-                index = self.lc.GetItem(self.id,0).GetText()
-                self.axes.plot([xdata[j] for j in xrange(np.size(self.data[index])) if self.data[index][j] == self.lc1.GetItem(i,0).GetText()],
-                               [ymax/2 for j in self.data[index] if j == self.lc1.GetItem(i,0).GetText()],'+',
-                               label = self.lc1.GetItem(i,0).GetText())
-        
-        self.axes.legend(bbox_to_anchor=(1., 1), loc=2, borderaxespad=0.,prop={'size':8})
+        setp(self.axes.get_xticklabels(), visible=self.cb_xlab.IsChecked())
         self.axes.set_xlabel(self.xlabel)
         self.axes.set_ylabel(self.ylabel)
+        return True
 
-        self.canvas.draw()
+    def update_style(self):
+        self.restyle.request()
+
+    def redraw_style(self):
+        if self.canvas is not None and self.apply_style():
+            self.canvas.draw()
+
+    def all_lines(self):
+        return list(self.lines.values()) + list(self.id_lines.values())
+
+    def on_canvas_draw(self, event):
+        """ Keeps the axes background without the (animated) lines for
+            blitting. The last rendered lines are drawn over it if the axes
+            did not move, and are rendered again if anything changed.
+        """
+        if self.printing:
+            return
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.update_densities()
+        for image in self.density_images.values():
+            self.axes.draw_artist(image)
+        key = self.current_layer_key()
+        if self.layer_key is not None and self.layer_key[:3] == key[:3]:
+            self.axes.draw_artist(self.layer_image)
+        if key != self.layer_key:
+            self.render_lines()
+
+    def current_layer_key(self):
+        """ What the rendered lines depend on: the limits and place of the
+            axes and the version of the lines' data
+        """
+        return (tuple(self.axes.get_xlim()), tuple(self.axes.get_ylim()),
+                tuple(self.axes.bbox.bounds), self.lines_version)
+
+    def render_lines(self):
+        """ Has the lines rendered off-screen; on_layer_rendered blits them.
+            A render still running for older lines is dropped.
+        """
+        artists = []
+        for line in self.all_lines():
+            if line.get_visible():
+                artists.extend(layer.detach(line))
+        bbox = self.axes.bbox
+        self.pending_layer_key = self.current_layer_key()
+        self.layer_origin = (bbox.x0, bbox.y0)
+        self.render_generation = self.renderer.submit(artists, bbox.width, bbox.height, self.fig.dpi,
+                                                      self.axes.get_xlim(), self.axes.get_ylim())
+
+    def on_layer_rendered(self, generation, image):
+        if generation != self.render_generation or self.canvas is None:
+            return
+        if isinstance(image, Exception):
+            self.flash_status_message("Error drawing lines: %s" % image)
+            return
+        self.layer_image.set_data(image)
+        self.layer_image.ox, self.layer_image.oy = self.layer_origin
+        self.layer_key = self.pending_layer_key
+        if self.background is None:
+            return
+        with perf.stage('blit'):
+            self.blit_lines()
+        if perf.recorder.enabled:
+            self.statusbar.SetStatusText("render lines took %.1f ms, blit %.1f ms" % (
+                1000 * perf.recorder.last('render lines'), 1000 * perf.recorder.last('blit')), 0)
+
+    def blit_lines(self):
+        """ Draws the density images and the rendered lines over the cached
+            background
+        """
+        self.canvas.restore_region(self.background)
+        for image in self.density_images.values():
+            self.axes.draw_artist(image)
+        self.axes.draw_artist(self.layer_image)
+        self.canvas.blit(self.axes.bbox)
+
+    def view(self):
+        """ The engine's DataView of self.data, made anew when it changes """
+        if self.data_view is None or self.data_view.data is not self.data:
+            self.data_view = engine.DataView(self.data)
+        return self.data_view
+
+    def series(self, name, xmin, xmax):
+        """ Returns the points of column name to plot between xmin and
+            xmax. Partial data shown during a load is not decimated.
+        """
+        return self.view().series(self.xname, name, xmin, xmax, max(int(self.axes.bbox.width), 100),
+                                  decimate=self.loader is None, row_filter=self.row_filter)
+
+    def on_xlim_changed(self, axes):
+        xmin, xmax = axes.get_xlim()
+        for name, line in self.lines.items():
+            line.set_data(*self.series(name, xmin, xmax))
+        self.lines_version += 1
+        self.canvas.draw_idle()
  
     """
     Menu functions
@@ -320,21 +860,93 @@ class GraphFrame(wx.Frame):
         self.dirname=os.getcwd()
         file_choices = "Text (*.txt)|*.txt"
         dlg = wx.FileDialog(self, 'Choose a file', self.dirname, '',
-                            'TXT files (*.txt)|*.txt|CSV files (*.csv)|*.csv|All files(*.*)|*.*'
+                            'TXT files (*.txt)|*.txt|CSV files (*.csv)|*.csv|Compressed CSV files|'
+                            + compressed.WILDCARD + '|Binary column files|' + columnar.WILDCARD
+                            + '|All files(*.*)|*.*'
                             ,wx.OPEN) 
         if dlg.ShowModal() == wx.ID_OK:
             self.dirname=dlg.GetDirectory() 
+            if columnar.is_columnar(os.path.join(self.dirname, dlg.GetFilename())):
+                self.open_columnar(os.path.join(self.dirname, dlg.GetFilename()))
+                return
             self.filename=os.path.join(self.dirname,dlg.GetFilename()) 
             
 
 
-            self.file=open(self.filename, 'r') 
-            self.datalength = len(next(csv.reader(self.file, delimiter=',')))
+            self.file=compressed.open_file(self.filename)
+            self.datalength = len(next(csv.reader([self.file.readline().decode('utf-8', 'replace')])))
             self.flash_status_message("Opened  %s" % self.filename)
+            self.row_filter = None
+            self.row_filter_text.SetValue("")
             self.open_popupbox_panel()
 
             
     
+    def on_open_column_dir(self, event):
+        dlg = wx.DirDialog(self, "Choose a directory of .npy columns", os.getcwd())
+        if dlg.ShowModal() == wx.ID_OK:
+            self.open_columnar(dlg.GetPath())
+        dlg.Destroy()
+
+    def open_columnar(self, path):
+        """ Opens a binary column file or directory. Its column names and
+            types fill the parameter list, there is nothing to parse.
+        """
+        start = time.time()
+        try:
+            with perf.stage('open columns'):
+                data = columnar.open_table(path)
+                formats = [columnar.column_format(data[name]) for name in data.names]
+        except (IOError, OSError, ValueError) as e:
+            self.flash_status_message("Error Loading Data: %s" % e)
+            return
+        if self.loader is not None:
+            self.loader.cancel()
+            self.end_load()
+        self.stop_follow()
+        self.filename = path
+        self.datalength = len(data.names)
+        self.data_end = None
+        self.row_filter = None
+        self.row_filter_text.SetValue("")
+        self.xaxis = None
+        self.yaxis = []
+        self.id = None
+        self.selcted_ids = []
+        self.set_params(data.names, formats, [""] * len(formats), ["from file"] * len(formats))
+        self.data = data
+        self.flash_status_message("Opened %d rows of %d columns in %.0f ms" % (
+            len(data), len(data.names), 1000 * (time.time() - start)))
+
+    def on_export_data(self, event):
+        if not hasattr(self.data, 'names') or not len(self.data):
+            self.flash_status_message("No data loaded")
+            return
+        if self.loader is not None:
+            self.flash_status_message("Wait for the load to finish before exporting")
+            return
+        dlg = wx.FileDialog(self, message="Export loaded data as...", defaultDir=os.getcwd(),
+                            defaultFile="data.npz", wildcard=columnar.EXPORT_WILDCARD, style=wx.SAVE)
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()
+            if not os.path.splitext(path)[1]:
+                path += ('.npz', '.columns', '.parquet', '.arrow')[dlg.GetFilterIndex()]
+            for name in self.data.names:
+                if not self.load_column(name):
+                    return
+            start = time.time()
+            busy = wx.BusyCursor()
+            try:
+                with perf.stage('export'):
+                    columnar.export_table(self.data, path)
+            except (IOError, OSError, ValueError) as e:
+                self.flash_status_message("Error exporting data: %s" % e)
+                return
+            finally:
+                del busy
+            self.flash_status_message("Exported %d rows to %s in %.1fs" % (len(self.data), path, time.time() - start))
+        dlg.Destroy()
+
     def open_popupbox_panel(self):
         self.parm_popup = PopUpBox(self,"Set Parameters")
         hbox = wx.BoxSizer(wx.HORIZONTAL)
@@ -343,7 +955,7 @@ class GraphFrame(wx.Frame):
         self.cb_param.SetValue(False) 
         
         self.tc1 = wx.TextCtrl(self.parm_popup.panel, -1)
-        self.lb1 = wx.ListBox(self.parm_popup.panel, -1, wx.DefaultPosition, (170, 20), ['String','Int','Float'], wx.LB_SINGLE)
+        self.lb1 = wx.ListBox(self.parm_popup.panel, -1, wx.DefaultPosition, (170, 20), ['String','Int','Float','Bool','Timestamp','Category'], wx.LB_SINGLE)
         hbox.AddMany([(self.cb_param, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL),
                             (wx.StaticText(self.parm_popup.panel, -1, 'Parameter'),0, wx.ALIGN_CENTER_VERTICAL),
                             (self.tc1, 0, wx.ALIGN_LEFT|wx.ALIGN_CENTER_VERTICAL),
@@ -353,34 +965,49 @@ class GraphFrame(wx.Frame):
         hbox1.Add(wx.Button(self.parm_popup.panel, 10, 'Add'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         hbox1.Add(wx.Button(self.parm_popup.panel, 11, 'Remove'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         hbox1.Add(wx.Button(self.parm_popup.panel, 12, 'Clear'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+        hbox1.Add(wx.Button(self.parm_popup.panel, 17, 'Full Scan'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         hbox1.Add(wx.Button(self.parm_popup.panel, 13, 'Load Data'), border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         self.Bind (wx.EVT_BUTTON, self.OnAdd, id=10)
         self.Bind (wx.EVT_BUTTON, self.OnRemove, id=11)
         self.Bind (wx.EVT_BUTTON, self.OnClear, id=12)
         self.Bind(wx.EVT_LISTBOX, self.OnSelect, self.lb1)
         self.Bind (wx.EVT_BUTTON, self.OnLoadData, id=13)
+        self.Bind (wx.EVT_BUTTON, self.OnFullScan, id=17)
         self.parm_popup.vbox.Add(hbox, 0, flag=wx.EXPAND | wx.TOP)
         self.parm_popup.vbox.Add(hbox1, 0, flag=wx.EXPAND | wx.TOP)
         self.parm_popup.create_panel()
         self.parm_popup.Show()
     
     
-    def auto_set_param(self):
-        file = open(self.filename)
-        header = file.readline().split(',')
-        format=np.genfromtxt(file, delimiter=",")
-    
-        for h in xrange(len(header)): 
-             num_items = self.lc.GetItemCount()
-             self.lc.InsertStringItem(num_items, header[h])
-             if np.isnan(format[0,h]):
-                 self.lc.SetStringItem(num_items, 1, "String")
-             else:
-                 self.lc.SetStringItem(num_items, 1, "Float")                       
-        file.close()
+    def auto_set_param(self, full=False):
+        """ Fills the parameter list from the header line, with formats
+            guessed from a sample of the file, or from every line if full
+        """
+        if columnar.is_columnar(self.filename):
+            self.flash_status_message("The columns of %s come from the file" % self.filename)
+            return
+        start = time.time()
+        header, types = engine.infer_columns(self.filename, full)
+
+        self.set_params(header, [t[0] for t in types], [""] * len(header),
+                        ["%d%% of %d" % (100 * confidence, seen) for _, confidence, seen in types])
+        self.flash_status_message("Inferred %d column types from %s in %.0f ms" % (
+            len(header), "all lines" if full else "a sample", 1000 * (time.time() - start)))
             
-           
+
+    def set_params(self, names, formats, plots, confidences):
+        """ Replaces the parameter list """
+        self.lc.model.set_columns(*[np.array(list(values), dtype=object)
+                                    for values in (names, formats, plots, confidences)])
+        self.lc.refresh()
+
+    def param_name(self, i):
+        return listmodel.text(self.lc.model.value(i, 0))
+
     def on_save_plot(self, event):
+        if self.canvas is None:
+            self.flash_status_message("Nothing plotted to save")
+            return
         file_choices = "PNG (*.png)|*.png"
         
         dlg = wx.FileDialog( self, message="Save plot as...", defaultDir=os.getcwd(),
@@ -388,11 +1015,102 @@ class GraphFrame(wx.Frame):
         
         if dlg.ShowModal() == wx.ID_OK:
             path = dlg.GetPath()
-            self.canvas.print_figure(path, dpi=self.dpi)
+            self.printing = True
+            artists = self.all_lines() + list(self.density_images.values())
+            for artist in artists:
+                artist.set_animated(False)
+            try:
+                self.canvas.print_figure(path, dpi=self.dpi)
+            finally:
+                for artist in artists:
+                    artist.set_animated(True)
+                self.printing = False
             self.flash_status_message("Saved to %s" % path)
     
     
+    def on_follow(self, event):
+        if not self.m_follow.IsChecked():
+            self.stop_follow()
+            return
+        if self.filename is not None and columnar.is_columnar(self.filename):
+            self.m_follow.Check(False)
+            self.flash_status_message("Binary column files cannot be followed")
+            return
+        if self.loader is not None or self.data_end is None:
+            self.m_follow.Check(False)
+            self.flash_status_message("Load the data file before following it")
+            return
+        if compressed.is_compressed(self.filename):
+            self.m_follow.Check(False)
+            self.flash_status_message("Compressed files cannot be followed")
+            return
+        self.follower = tail.FileFollower(self.filename, self.load_dt, self.data_end,
+                                          self.load_categories, self.follow_window, self.data)
+        self.data = self.follower.table()
+        self.follow_timer.Start(FOLLOW_POLL_MS)
+
+    def stop_follow(self):
+        if self.follower is None:
+            return
+        self.follow_timer.Stop()
+        self.data_end = self.follower.offset
+        self.follower = None
+        self.m_follow.Check(False)
+        self.statusbar.SetStatusText('', 1)
+
+    def on_follow_timer(self, event):
+        """ Appends new lines of the followed file and redraws at most
+            FOLLOW_MAX_FPS times a second
+        """
+        try:
+            rows = self.follower.poll()
+        except (ValueError, IOError, OSError) as e:
+            self.stop_follow()
+            self.flash_status_message("Stopped following: %s" % e)
+            return
+        if rows:
+            data = self.follower.table()
+            if rows > 0 and self.follow_window is None:
+                self.data_view = self.view().extended(data)
+            self.data = data
+            renumbered = self.follower.renumbered()
+            if self.id is not None and self.param_name(self.id) in renumbered:
+                # The rolling window dropped IDs and renumbered the others
+                remap = renumbered[self.param_name(self.id)]
+                self.show_ids([remap[code] for code in self.selcted_ids if remap[code] >= 0])
+            self.follow_pending = True
+            self.statusbar.SetStatusText("Following: %d rows" % len(self.data), 1)
+        now = time.time()
+        if (self.follow_pending and self.plotted_data is not None and
+                now - self.last_follow_draw >= 1.0 / FOLLOW_MAX_FPS):
+            self.follow_pending = False
+            self.last_follow_draw = now
+            self.redraw.request()
+
+    def on_rolling_window(self, event):
+        dlg = wx.TextEntryDialog(self, "Rows to keep while following (empty for all rows)",
+                                 "Rolling window", str(self.follow_window or ""))
+        if dlg.ShowModal() == wx.ID_OK:
+            value = dlg.GetValue().strip()
+            if value and not value.isdigit():
+                self.flash_status_message("Rolling window must be a number of rows")
+                return
+            self.follow_window = int(value) if value and int(value) > 0 else None
+            if self.follower is not None:
+                self.stop_follow()
+                self.m_follow.Check(True)
+                self.on_follow(event)
+        dlg.Destroy()
+
+    def on_cancel_load(self, event):
+        if self.loader is not None:
+            self.loader.cancel()
+
     def on_exit(self, event):
+        if self.loader is not None:
+            self.loader.cancel()
+        self.stop_follow()
+        self.renderer.stop()
         self.Destroy()
         
     def on_edit_label(self,event):
@@ -404,7 +1122,7 @@ class GraphFrame(wx.Frame):
         def OK(event):
             self.xlabel=x.GetValue()
             self.ylabel=y.GetValue()
-            self.draw_plot()         
+            self.redraw.request()
             label_popup.on_exit(event)
             
         label_popup=PopUpBox(self,"Edit Labels")
@@ -426,7 +1144,63 @@ class GraphFrame(wx.Frame):
         label_popup.vbox.Add(hbox1, 0, flag=wx.EXPAND | wx.TOP)
         label_popup.create_panel()
         label_popup.Show()
-    
+
+    def on_performance(self, event):
+        self.performance_popup_panel()
+
+    def performance_popup_panel(self):
+        """ Per stage timings from perf, with switches to record them,
+            clear them and write them out as a Chrome trace
+        """
+        def refresh(event=None):
+            lc.DeleteAllItems()
+            for row in perf.recorder.summary():
+                name, count, total, mean, longest, last, rss = row
+                i = lc.GetItemCount()
+                lc.InsertStringItem(i, name)
+                lc.SetStringItem(i, 1, str(count))
+                for col, seconds in enumerate((total, mean, longest, last)):
+                    lc.SetStringItem(i, 2 + col, "%.1f" % (1000 * seconds))
+                lc.SetStringItem(i, 6, "%+.1f" % rss)
+
+        def on_enable(event):
+            perf.recorder.enabled = cb.IsChecked()
+
+        def on_reset(event):
+            perf.recorder.reset()
+            refresh()
+
+        def on_trace(event):
+            dlg = wx.FileDialog(perf_popup, message="Save trace as...", defaultDir=os.getcwd(),
+                                defaultFile="trace.json", wildcard="JSON (*.json)|*.json",
+                                style=wx.SAVE)
+            if dlg.ShowModal() == wx.ID_OK:
+                path = dlg.GetPath()
+                self.flash_status_message("Wrote %d events to %s" % (perf.recorder.dump_trace(path), path))
+
+        perf_popup = PopUpBox(self, "Performance")
+        cb = wx.CheckBox(perf_popup.panel, -1, "Record timings")
+        cb.SetValue(perf.recorder.enabled)
+        cb.Bind(wx.EVT_CHECKBOX, on_enable)
+
+        lc = wx.ListCtrl(perf_popup.panel, -1, size=(600, 250), style=wx.LC_REPORT)
+        for col, heading in enumerate(['Stage', 'Count', 'Total ms', 'Mean ms', 'Max ms', 'Last ms', 'RSS MB']):
+            lc.InsertColumn(col, heading)
+        lc.SetColumnWidth(0, 150)
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        for label, handler in (('Refresh', refresh), ('Reset', on_reset), ('Save Trace', on_trace)):
+            button = wx.Button(perf_popup.panel, -1, label)
+            button.Bind(wx.EVT_BUTTON, handler)
+            hbox.Add(button, border=5, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
+
+        perf_popup.vbox.Add(cb, 0, border=5, flag=wx.ALL)
+        perf_popup.vbox.Add(lc, 1, flag=wx.EXPAND)
+        perf_popup.vbox.Add(hbox, 0, flag=wx.EXPAND | wx.TOP)
+        perf_popup.create_panel()
+        refresh()
+        perf_popup.Show()
+
     def flash_status_message(self, msg, flash_len_ms=1500):
         self.statusbar.SetStatusText(msg)
         self.timeroff = wx.Timer(self)
@@ -443,20 +1217,30 @@ class GraphFrame(wx.Frame):
     def OnAdd(self, event):
         if not self.tc1.GetValue():
             return
-        num_items = self.lc.GetItemCount()
-        self.lc.InsertStringItem(num_items, self.tc1.GetValue())
-        self.lc.SetStringItem(num_items, 1, self.format)
+        self.lc.model.append(self.tc1.GetValue(), self.format, "", "")
+        self.lc.refresh()
         self.tc1.Clear()
         
     def OnRemove(self, event):
-        index = self.lc.GetFocusedItem()
-        self.lc.DeleteItem(index)
+        index = self.lc.focused_item()
+        if index < 0:
+            return
+        self.lc.model.delete(index)
+        self.lc.refresh()
 
     def OnClear(self, event):
-        self.lc.DeleteAllItems()
-        self.file.close()
+        self.set_params([], [], [], [])
+        compressed.close(self.file)
         self.__init__
     
+    def OnFullScan(self, event):
+        if not self.cb_param.IsChecked():
+            self.flash_status_message("Check \"Use First Line\" to infer formats")
+            return
+        busy = wx.BusyCursor()
+        self.auto_set_param(full=True)
+        del busy
+
     def OnSelect(self, event):
         index = event.GetSelection()
         self.format = self.lb1.GetString(index)
@@ -465,82 +1249,273 @@ class GraphFrame(wx.Frame):
         if self.filename == None:
             self.flash_status_message("No Data File open")
             return
+        if columnar.is_columnar(self.filename):
+            self.parm_popup.on_exit(event)
+            self.open_columnar(self.filename)
+            return
               
-        if self.datalength != self.lc.GetItemCount():
+        if self.datalength != self.lc.model.count():
             self.flash_status_message("Data has %d columns. Please define all parameters " % self.datalength)
             return
                
-        names  =[]
-        formats =[]
+        columns = []
         for i in xrange(self.datalength):
-            names.append(self.lc.GetItem(i,0).GetText())
-            formats.append(self.formats_list[self.lc.GetItem(i,1).GetText()])
+            columns.append((self.param_name(i), self.lc.model.value(i, 1)))
 
-        dt = np.dtype({'names':names,'formats':formats})
-        
+        dt, categories = engine.make_dtype(columns)
+
+        if self.loader is not None:
+            self.loader.cancel()
+            self.end_load()
+        self.stop_follow()
+        self.data_end = None
+
+        self.load_dt = dt
+        self.load_categories = categories
+        cache = self.cache if self.m_cache.IsChecked() else None
+        if self.m_lazy.IsChecked() and compressed.is_compressed(self.filename):
+            self.flash_status_message("Compressed files are loaded whole, lazy columns need random access")
+        elif self.m_lazy.IsChecked():
+            self.parm_popup.on_exit(event)
+            self.open_lazy(columns, cache)
+            return
+        if cache is not None:
+            try:
+                cached = cache.get(self.filename, dt, categories=categories)
+            except (IOError, OSError):
+                cached = None
+            if cached is not None:
+                self.data = cached
+                self.data_end = os.path.getsize(self.filename)
+                self.parm_popup.on_exit(event)
+                self.flash_status_message("Loaded %d rows from cache" % len(self.data))
+                return
+
+        self.loader = engine.Loader(self.filename, dt, self.notify_load, categories, cache)
+        self.data = self.loader.snapshot()
+        self.loader.start()
+        self.m_cancel.Enable(True)
+        self.gauge.SetValue(0)
+        self.gauge.Show()
+        self.parm_popup.on_exit(event)
+
+    def open_lazy(self, columns, cache):
+        """ Indexes the rows of the file; columns are parsed when they are
+            chosen as X, Y or ID
+        """
+        start = time.time()
+        dlg, progress = self.progress_dialog("Lazy columns", "Indexing rows of %s" % self.filename)
         try:
-             self.data=np.loadtxt(self.file,dt,delimiter=',')
-             self.parm_popup.on_exit(event)
-        except:
-            self.flash_status_message("Error Loading Data" )
+            data = engine.open_lazy(self.filename, columns, cache, progress)
+        except (IOError, OSError, ValueError) as e:
+            self.flash_status_message("Error Loading Data: %s" % e)
+            return
+        finally:
+            dlg.Destroy()
+        if data is None:
+            self.flash_status_message("Indexing cancelled")
+            return
+        self.data = data
+        self.flash_status_message("Indexed %d rows in %.1fs" % (len(data), time.time() - start))
+
+    def is_lazy(self):
+        return hasattr(self.data, 'is_loaded')
+
+    def load_column(self, name):
+        """ Parses column name of a lazily loaded file if it is not loaded
+            yet. Returns False if that was cancelled or failed.
+        """
+        if not self.is_lazy() or self.data.is_loaded(name):
+            return True
+        start = time.time()
+        dlg, progress = self.progress_dialog("Lazy columns", "Parsing column %s" % name)
+        try:
+            column = self.data.load(name, progress)
+        except (IOError, OSError, ValueError) as e:
+            self.flash_status_message("Error Loading Data: %s" % e)
+            return False
+        finally:
+            dlg.Destroy()
+        if column is None:
+            self.flash_status_message("Parsing %s cancelled" % name)
+            return False
+        self.flash_status_message("Parsed %s in %.1fs, %.0f MB of columns in memory" % (
+            name, time.time() - start, self.data.nbytes() / 1e6))
+        return True
+
+    def progress_dialog(self, title, message):
+        """ Returns a progress dialog and a progress(done, total) callback
+            for it that returns False once Cancel is pressed
+        """
+        dlg = wx.ProgressDialog(title, message, 100, self,
+                                wx.PD_APP_MODAL | wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME)
+        def progress(done, total):
+            return dlg.Update(int(100.0 * done / max(total, 1)))[0]
+        return dlg, progress
+
+    def end_load(self):
+        self.loader = None
+        self.m_cancel.Enable(False)
+        self.gauge.Hide()
+        self.statusbar.SetStatusText('', 1)
+
+    def notify_load(self, event, *args):
+        """ Called from the loader thread, runs on_load_<event> on the GUI thread """
+        wx.CallAfter(getattr(self, 'on_load_' + event), *args)
+
+    def on_load_progress(self, loader, nbytes, total, rows, elapsed):
+        if loader is not self.loader:
+            return
+        self.gauge.SetValue(int(100.0 * nbytes / max(total, 1)))
+        rate = nbytes / max(elapsed, 1e-6)
+        self.statusbar.SetStatusText("%.0f/%.0f MB  %d rows/s  ETA %ds" % (
+            nbytes / 1e6, total / 1e6, rows / max(elapsed, 1e-6), (total - nbytes) / rate), 1)
+
+    def on_load_done(self, loader, data, elapsed):
+        if loader is not self.loader:
+            return
+        self.data = data
+        self.data_end = loader.end
+        self.end_load()
+        self.flash_status_message("Loaded %d rows in %.1fs" % (len(data), elapsed))
+
+    def on_load_cancelled(self, loader):
+        if loader is not self.loader:
+            return
+        self.data = loader.snapshot()
+        self.end_load()
+        self.flash_status_message("Load cancelled after %d rows" % len(self.data))
+
+    def on_load_error(self, loader, msg):
+        if loader is not self.loader:
+            return
+        self.end_load()
+        self.flash_status_message("Error Loading Data: %s" % msg)
               
     
     def OnXSelect(self,event):
-        index = self.lc.GetFocusedItem()
+        index = self.lc.focused_item()
+        if index < 0:
+            return
          
-        if(self.lc.GetItem(index,2).GetText()!="X axis"):
-            self.lc.SetStringItem(index,2,"X axis")
+        if(self.lc.model.value(index,2)!="X axis"):
+            if not self.load_column(self.param_name(index)):
+                return
+            self.lc.model.set_value(index,2,"X axis")
         else:
-            self.lc.SetStringItem(index,2,"")
+            self.lc.model.set_value(index,2,"")
             self.xaxis=None
+            self.lc.Refresh()
             return
              
         if(self.xaxis):
-            self.lc.SetStringItem(self.xaxis-1,2,"")
+            self.lc.model.set_value(self.xaxis-1,2,"")
          
         self.xaxis=index+1
+        self.lc.Refresh()
             
     
     def OnYSelect(self,event):
-        index = self.lc.GetFocusedItem()
-        if(self.lc.GetItem(index,2).GetText() =="Y axis"):
-            self.lc.SetStringItem(index,2,"")
+        index = self.lc.focused_item()
+        if index < 0:
+            return
+        if(self.lc.model.value(index,2) =="Y axis"):
+            self.lc.model.set_value(index,2,"")
             self.yaxis.remove(index)        
         else:
-            self.lc.SetStringItem(index,2,"Y axis")
+            if not self.load_column(self.param_name(index)):
+                return
+            self.lc.model.set_value(index,2,"Y axis")
             self.yaxis.append(index)
+        self.lc.Refresh()
             
     
     def OnFindID(self,event):
-        self.lc1.DeleteAllItems()
-        index = self.lc.GetFocusedItem()
+        index = self.lc.focused_item()
+        if index < 0:
+            return
+        if not self.load_column(self.param_name(index)):
+            return
         self.id=index
-        unique_id= set(self.data[self.lc.GetItem(index,0).GetText()])
-        for i in xrange(len(unique_id)):
-            num_items = self.lc1.GetItemCount()
-            self.lc1.InsertStringItem(num_items, unique_id.pop())
+        self.show_ids()
+
+    def show_ids(self, selected=()):
+        """ Lists the IDs of the ID column in sorted order with their number
+            of rows, leaving out IDs with no rows passing the row filter.
+            The IDs whose codes are in selected stay selected.
+        """
+        unique_id = self.view().category_index(self.param_name(self.id))
+        codes = unique_id.sorted_codes()
+        counts = unique_id.counts
+        mask = self.view().mask(self.row_filter)
+        if mask is not None:
+            counts = np.bincount(unique_id.codes[mask], minlength=len(unique_id))
+        counts = counts[codes]
+        if mask is not None:
+            codes, counts = codes[counts > 0], counts[counts > 0]
+        self.lc1.model.set_columns(unique_id.categories[codes], counts, codes)
+        self.lc1.model.selected[:] = np.isin(codes, list(selected))
+        self.selcted_ids = list(codes[self.lc1.model.selected])
+        self.lc1.refresh()
             
-    def OnSelectID(self,event):
-        index=self.lc1.GetFocusedItem()
-        if (self.selcted_ids.count(index)==0):
-            self.selcted_ids.append(index)
+    def OnSelectID(self):
+        """ Called by self.lc1 after its selection changed """
+        self.selcted_ids = list(self.lc1.model.columns[2][self.lc1.model.selected_items()])
+
+    def on_row_filter(self, event):
+        """ Applies the expression in the row filter box. Its mask is
+            computed once per table and kept by the view.
+        """
+        text = self.row_filter_text.GetValue().strip()
+        if not text:
+            self.row_filter = None
         else:
-            self.selcted_ids.remove(index) 
+            if self.filename is None:
+                self.flash_status_message("No file loaded in workspace")
+                return
+            names = [self.param_name(i) for i in range(self.lc.model.count())]
+            try:
+                row_filter = rowfilter.RowFilter(text, names)
+                for name in sorted(row_filter.columns):
+                    if not self.load_column(name):
+                        return
+                mask = self.view().mask(row_filter)
+            except (rowfilter.FilterError, TypeError, ValueError) as e:
+                self.flash_status_message("Row filter: %s" % e, 4000)
+                return
+            self.row_filter = row_filter
+            self.flash_status_message("%d of %d rows pass the filter" % (mask.sum(), len(mask)), 4000)
+        if self.id is not None:
+            self.show_ids()
+        if self.plotted_data is not None:
+            self.redraw.request()
     
+    def on_id_mode(self, event):
+        if self.plotted_data is not None:
+            self.redraw.request()
+
+    def on_y_mode(self, event):
+        if self.plotted_data is not None:
+            self.redraw.request()
+
+    def on_bounds_changed(self):
+        if self.plotted_data is not None:
+            self.redraw.request()
+
     def OnPlot(self, event):
-         self.draw_plot()
+         self.redraw.request()
        
     def on_cb_grid(self, event):
-        self.draw_plot()
+        self.update_style()
     
     def on_cb_xlab(self, event):
-        self.draw_plot()
+        self.update_style()
 
     def on_cb_title(self, event):
-        self.draw_plot()
+        self.update_style()
     
     def on_cb_bg(self,event):
-        self.draw_plot()
+        self.update_style()
         
     def on_cb_param(self,event):
         self.tc1.Enable(not self.cb_param.IsChecked())
@@ -548,7 +1523,7 @@ class GraphFrame(wx.Frame):
         if self.cb_param.IsChecked():
             self.auto_set_param()
         else:
-            self.lc.DeleteAllItems()
+            self.set_params([], [], [], [])
  
  
 
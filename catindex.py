@@ -0,0 +1,249 @@
+"""
+
+Categorical index for ID columns.
+A column is factorized once into its sorted unique values and an integer
+code per row. The rows of every value are kept grouped in arrays with
+offsets, so the rows of any set of values are gathered without a Python
+loop over the rows.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+
+CATEGORY = 'Category'
+
+class Run(object):
+    """ The rows first:first + len(order) grouped by code: the rows of code
+        c, in row order, are order[offsets[c]:offsets[c + 1]]. Codes past
+        the end of offsets have no rows.
+    """
+    def __init__(self, first, order, offsets):
+        self.first = first
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def of(cls, codes, first, ncategories):
+        codes = np.asarray(codes)
+        order = first + np.argsort(codes, kind='mergesort').astype(np.int64)
+        counts = np.bincount(codes, minlength=ncategories)
+        return cls(first, order, np.concatenate(([0], np.cumsum(counts))))
+
+    def __len__(self):
+        return len(self.order)
+
+    def starts(self, codes):
+        return self.offsets[np.minimum(codes, len(self.offsets) - 1)]
+
+    def lengths(self, codes):
+        return self.starts(codes + 1) - self.starts(codes)
+
+    def remapped(self, remap, ncategories):
+        """ The run with code c renumbered remap[c], remap being increasing
+            so the groups keep their order
+        """
+        counts = np.zeros(ncategories, dtype=np.int64)
+        counts[remap[:len(self.offsets) - 1]] = np.diff(self.offsets)
+        return Run(self.first, self.order, np.concatenate(([0], np.cumsum(counts))))
+
+    def merged(self, other):
+        """ One run of this run and other, which holds the rows just after
+            it, in one linear pass
+        """
+        codes = np.arange(max(len(self.offsets), len(other.offsets)) - 1)
+        counts, other_counts = self.lengths(codes), other.lengths(codes)
+        offsets = np.concatenate(([0], np.cumsum(counts + other_counts)))
+        order = np.empty(len(self) + len(other), dtype=np.int64)
+        for run, run_counts, skip in ((self, counts, 0), (other, other_counts, counts)):
+            group = np.repeat(codes, run_counts)
+            shift = offsets[:-1] + skip - np.concatenate(([0], np.cumsum(run_counts)))[:-1]
+            order[np.arange(len(run)) + shift[group]] = run.order
+        return Run(self.first, order, offsets)
+
+
+class CategoricalIndex(object):
+    """ The rows of every category of a column. The rows are kept in runs
+        of consecutive rows, each grouped by code. Appended rows are added
+        as a new run and runs of close sizes are merged, as in a log
+        structured merge tree, so extending the index costs O(log rows)
+        per new row instead of regrouping every row.
+    """
+    def __init__(self, categories, codes, sorter=None, runs=None, counts=None):
+        self.categories = categories
+        self.codes = codes
+        self.sorter = sorter
+        if counts is None:
+            counts = np.bincount(codes, minlength=len(categories))
+        self.counts = counts
+        if runs is None:
+            runs = [Run.of(codes, 0, len(categories))]
+        self.runs = runs
+
+    @classmethod
+    def from_values(cls, values):
+        categories, codes = np.unique(values, return_inverse=True)
+        return cls(categories, codes.ravel())
+
+    def __len__(self):
+        return len(self.categories)
+
+    def extended(self, column):
+        """ Index of column, which holds the rows of this index followed by
+            appended ones. Only the new rows are grouped; a column whose
+            vocabulary grew sorted renumbers the runs, not the rows.
+        """
+        n = len(self.codes)
+        sorter = None
+        if isinstance(column, CategoricalColumn):
+            categories, codes, sorter = column.categories, column.codes, column.sorter
+            new_codes = np.asarray(codes[n:], dtype=np.int64)
+        else:
+            new_values = np.asarray(column[n:])
+            categories = np.union1d(self.categories, new_values)
+            new_codes = np.searchsorted(categories, new_values)
+            codes = self.codes
+            if len(categories) != len(self.categories):
+                codes = np.searchsorted(categories, self.categories)[codes]
+            codes = np.concatenate((codes, new_codes))
+        runs = self.runs
+        counts = np.zeros(len(categories), dtype=np.int64)
+        if sorter is None and len(categories) != len(self.categories):
+            # Sorted vocabulary: the old codes move up past the new values
+            remap = np.searchsorted(categories, self.categories)
+            runs = [run.remapped(remap, len(categories)) for run in runs]
+            counts[remap] = self.counts
+        else:
+            # Codes of a vocabulary that is only appended to stay the same
+            counts[:len(self.counts)] = self.counts
+        counts += np.bincount(new_codes, minlength=len(categories))
+        if len(new_codes):
+            runs = runs + [Run.of(new_codes, n, len(categories))]
+            while len(runs) > 1 and len(runs[-2]) <= 2 * len(runs[-1]):
+                runs = runs[:-2] + [runs[-2].merged(runs[-1])]
+        return CategoricalIndex(categories, codes, sorter, runs, counts)
+
+    def label(self, code):
+        value = self.categories[code]
+        if isinstance(value, bytes) and not isinstance(value, str):
+            return value.decode('utf-8', 'replace')
+        return str(value)
+
+    def sorted_codes(self):
+        """ Codes of the categories in sorted order """
+        return np.arange(len(self.categories)) if self.sorter is None else self.sorter
+
+    def code_of(self, value):
+        """ Code of value, or -1 if it does not occur """
+        i = int(np.searchsorted(self.categories, value, sorter=self.sorter))
+        if i < len(self.categories):
+            code = i if self.sorter is None else int(self.sorter[i])
+            if self.categories[code] == value:
+                return code
+        return -1
+
+    def rows(self, code):
+        """ Rows holding the value with this code, in row order """
+        parts = [run.order[run.starts(code):run.starts(code + 1)] for run in self.runs]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def take(self, codes):
+        """ Rows holding any of codes, in row order """
+        codes = np.asarray(codes, dtype=int)
+        if int(self.counts[codes].sum()) * 8 > len(self.codes):
+            selected = np.zeros(len(self.categories), dtype=bool)
+            selected[codes] = True
+            return np.flatnonzero(selected[self.codes])
+        return np.sort(self.group_rows(codes)[0])
+
+    def group_rows(self, codes):
+        """ Returns (rows, lengths): the rows of each of codes one after the
+            other, each group in row order, and the number of rows of each
+        """
+        codes = np.asarray(codes, dtype=int)
+        lengths = self.counts[codes]
+        out = np.empty(int(lengths.sum()), dtype=np.int64)
+        # Where the rows of each group from the runs so far end in out
+        filled = np.cumsum(lengths) - lengths
+        for run in self.runs:
+            run_lengths = run.lengths(codes)
+            total = int(run_lengths.sum())
+            step = np.arange(total) - np.repeat(np.cumsum(run_lengths) - run_lengths, run_lengths)
+            out[np.repeat(filled, run_lengths) + step] = run.order[np.repeat(run.starts(codes), run_lengths) + step]
+            filled += run_lengths
+        return out, lengths
+
+
+def code_dtype(n):
+    """ Smallest unsigned integer type holding codes for n categories """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+class CategoricalColumn(object):
+    """ Dictionary encoded string column: an integer code per row and the
+        vocabulary the codes index. Indexing decodes on demand. The
+        vocabulary is sorted, unless sorter is given: the permutation that
+        sorts it, for a vocabulary that is appended to as values arrive.
+    """
+    def __init__(self, categories, codes, sorter=None):
+        self.categories = categories
+        self.codes = codes
+        self.sorter = sorter
+        self.rank = None
+
+    @classmethod
+    def encode(cls, values):
+        categories, codes = np.unique(values, return_inverse=True)
+        return cls(categories, codes.ravel().astype(code_dtype(len(categories))))
+
+    @classmethod
+    def concat(cls, columns):
+        """ Joins columns with different vocabularies into one """
+        if len(columns) == 1:
+            return columns[0]
+        categories = np.unique(np.concatenate([c.categories for c in columns]))
+        dtype = code_dtype(len(categories))
+        codes = np.concatenate([np.searchsorted(categories, c.categories).astype(dtype)[c.codes]
+                                for c in columns])
+        return cls(categories, codes)
+
+    @property
+    def dtype(self):
+        return self.categories.dtype
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.categories.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        return self.categories[self.codes[key]]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.categories[self.codes]
+        return values if dtype is None else values.astype(dtype)
+
+    def ranks(self):
+        """ Position in sorted order of every category """
+        if self.sorter is None:
+            return np.arange(len(self.categories))
+        if self.rank is None:
+            self.rank = np.empty(len(self.sorter), dtype=np.int64)
+            self.rank[self.sorter] = np.arange(len(self.sorter))
+        return self.rank
+
+    def sorted(self):
+        """ The column with its vocabulary sorted """
+        if self.sorter is None:
+            return self
+        codes = self.ranks().astype(code_dtype(len(self.categories)))[self.codes]
+        return CategoricalColumn(self.categories[self.sorter], codes)
+
+    def index(self):
+        """ CategoricalIndex straight from the codes, without np.unique """
+        return CategoricalIndex(self.categories, self.codes, self.sorter)
@@ -0,0 +1,154 @@
+"""
+
+On-disk column cache for the data analysis gui.
+Every loaded column is stored as a .npy file, keyed by the path, size and
+modification time of the source file and by the column name and format.
+Dictionary encoded columns are stored as a codes and a categories file.
+Cached columns are reopened with np.load(mmap_mode='r'), so only the pages
+that are actually used get read. The cache is capped in size and the least
+recently used entries are evicted first.
+
+License: this code is in the public domain
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from catindex import CATEGORY, CategoricalColumn
+from table import ColumnTable
+
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'pythoncsvgui')
+MAX_BYTES = 10 * 1024 ** 3
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+
+
+def _replace(src, dst):
+    """ os.replace, which Python 2 lacks. There the target is removed
+        first, as rename does not overwrite a file on Windows.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+    if os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+def _is_category(fmt):
+    return isinstance(fmt, str) and fmt == CATEGORY
+
+
+class ColumnCache(object):
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def entry(self, filename, skip_lines=1):
+        """ Directory holding the columns of the current version of filename """
+        st = os.stat(filename)
+        key = '%s|%d|%r|%d' % (os.path.abspath(filename), st.st_size, st.st_mtime, skip_lines)
+        return os.path.join(self.root, _digest(key))
+
+    def column_path(self, entry, name, fmt):
+        """ Path of the column without extension. fmt is a dtype, or
+            CATEGORY for a dictionary encoded column.
+        """
+        if not _is_category(fmt):
+            fmt = np.dtype(fmt).str
+        return os.path.join(entry, _digest('%s|%s' % (name, fmt)))
+
+    def get_column(self, filename, name, fmt, skip_lines=1):
+        """ Returns the cached column memory mapped, or None """
+        entry = self.entry(filename, skip_lines)
+        path = self.column_path(entry, name, fmt)
+        if _is_category(fmt):
+            if not os.path.exists(path + '.codes.npy'):
+                return None
+            column = CategoricalColumn(np.load(path + '.categories.npy'),
+                                       np.load(path + '.codes.npy', mmap_mode='r'))
+        elif os.path.exists(path + '.npy'):
+            column = np.load(path + '.npy', mmap_mode='r')
+        else:
+            return None
+        os.utime(entry, None)
+        return column
+
+    def get(self, filename, dt, skip_lines=1, categories=()):
+        """ Returns a ColumnTable of memory mapped columns if every field of
+            dt is cached, otherwise None
+        """
+        columns = []
+        for name in dt.names:
+            fmt = CATEGORY if name in categories else dt[name]
+            column = self.get_column(filename, name, fmt, skip_lines)
+            if column is None:
+                return None
+            columns.append(column)
+        return ColumnTable(dt.names, columns)
+
+    def put_column(self, filename, name, column, skip_lines=1):
+        entry = self.entry(filename, skip_lines)
+        if not os.path.isdir(entry):
+            os.makedirs(entry)
+            with open(os.path.join(entry, 'source.json'), 'w') as f:
+                json.dump({'path': os.path.abspath(filename)}, f)
+        if isinstance(column, CategoricalColumn):
+            column = column.sorted()
+            path = self.column_path(entry, name, CATEGORY)
+            self._save(path + '.categories.npy', column.categories)
+            self._save(path + '.codes.npy', column.codes)
+        else:
+            self._save(self.column_path(entry, name, column.dtype) + '.npy', column)
+
+    def _save(self, path, array):
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+        _replace(tmp, path)
+
+    def put(self, filename, data, skip_lines=1):
+        """ Stores every column of data (a structured array or ColumnTable)
+            and returns the columns reopened from the cache
+        """
+        names = data.dtype.names if hasattr(data, 'dtype') else data.names
+        for name in names:
+            self.put_column(filename, name, data[name], skip_lines)
+        self.evict(keep=self.entry(filename, skip_lines))
+        return ColumnTable(names, [self.get_column(filename, name, self._format(data[name]), skip_lines)
+                                   for name in names])
+
+    def _format(self, column):
+        if isinstance(column, CategoricalColumn):
+            return CATEGORY
+        return column.dtype
+
+    def evict(self, keep=None):
+        """ Removes least recently used entries until the cache fits in max_bytes """
+        if not os.path.isdir(self.root):
+            return
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+            total += size
+        for mtime, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
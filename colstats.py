@@ -0,0 +1,95 @@
+"""
+
+Column statistics and zone maps for the data analysis gui.
+For a numeric column the minimum, maximum, NaN count and whether it never
+decreases are computed once, together with the minimum and maximum of every
+block of ZONE_ROWS rows. Automatic limits are then read off the statistics
+and an X range is narrowed to the blocks that can hold rows inside it,
+without looking at the rows. Statistics can be extended in place when rows
+are appended to their column.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+
+ZONE_ROWS = 64 * 1024
+CHUNK_ZONES = 64
+
+
+def has_stats(column):
+    return getattr(column, 'dtype', None) is not None and column.dtype.kind in 'iuf'
+
+
+class ColumnStats(object):
+    def __init__(self):
+        self.rows = 0
+        self.min = np.nan
+        self.max = np.nan
+        self.nan_count = 0
+        self.sorted = True
+        self.last = None
+        self.zone_min = np.empty(0)
+        self.zone_max = np.empty(0)
+
+    @classmethod
+    def of(cls, column):
+        stats = cls()
+        stats.update(column)
+        return stats
+
+    def update(self, column):
+        """ Extends the statistics to column, which must start with the rows
+            they were computed for. Only the zones holding new rows are
+            computed.
+        """
+        first = self.rows // ZONE_ROWS
+        zone_min = [self.zone_min[:first]]
+        zone_max = [self.zone_max[:first]]
+        step = ZONE_ROWS * CHUNK_ZONES
+        for lo in range(first * ZONE_ROWS, len(column), step):
+            part = np.asarray(column[lo:lo + step])
+            values = part.astype(float)
+            starts = np.arange(0, len(part), ZONE_ROWS)
+            zone_min.append(np.fmin.reduceat(values, starts))
+            zone_max.append(np.fmax.reduceat(values, starts))
+
+            new = part[max(self.rows - lo, 0):]
+            if len(new):
+                if part.dtype.kind == 'f':
+                    self.nan_count += int(np.isnan(new).sum())
+                if self.sorted:
+                    self.sorted = (bool(np.all(new[1:] >= new[:-1])) and
+                                   (self.last is None or bool(new[0] >= self.last)))
+                self.last = new[-1]
+                self.rows = lo + len(part)
+        self.zone_min = np.concatenate(zone_min)
+        self.zone_max = np.concatenate(zone_max)
+        if len(self.zone_min):
+            self.min = np.fmin.reduce(self.zone_min)
+            self.max = np.fmax.reduce(self.zone_max)
+
+    def zone_rows(self, xmin, xmax):
+        """ Rows of the zones overlapping [xmin, xmax], as a slice when they
+            are contiguous and as an array of row numbers otherwise
+        """
+        overlap = (self.zone_max >= xmin) & (self.zone_min <= xmax)
+        zones = np.flatnonzero(overlap)
+        if len(zones) == len(overlap):
+            return slice(None)
+        if not len(zones):
+            return slice(0, 0)
+        if zones[-1] - zones[0] + 1 == len(zones):
+            return slice(int(zones[0]) * ZONE_ROWS, min((int(zones[-1]) + 1) * ZONE_ROWS, self.rows))
+        starts = zones * ZONE_ROWS
+        lengths = np.minimum(ZONE_ROWS, self.rows - starts)
+        total = int(lengths.sum())
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+def table_stats(data):
+    """ Fills data.stats with the statistics of every numeric column """
+    for name in data.names:
+        column = data[name]
+        if has_stats(column) and name not in data.stats:
+            data.stats[name] = ColumnStats.of(column)
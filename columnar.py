@@ -0,0 +1,250 @@
+"""
+
+Binary column files for the data analysis gui.
+A table can be opened from, and exported to, a NumPy .npz archive, a
+directory of one .npy file per column (memory mapped when read), and,
+when pyarrow is installed, Parquet and Arrow IPC files. Column names and
+formats come from the file, so nothing has to be parsed or inferred.
+
+Files written here carry a manifest of the column names and formats, and
+store Category columns as a codes and a categories array as the column
+cache does. Files without a manifest, such as those written by other
+programs, get one column per array, named after it.
+
+License: this code is in the public domain
+"""
+import json
+import os
+
+import numpy as np
+
+from catindex import CATEGORY, CategoricalColumn
+from table import ColumnTable
+
+
+MANIFEST = '__columns__'
+COLUMN_DIR = '.columns'
+NPZ = '.npz'
+PARQUET = ('.parquet', '.pq')
+ARROW = ('.arrow', '.feather', '.ipc')
+WILDCARD = '*.npz;*.parquet;*.pq;*.arrow;*.feather;*.ipc'
+EXPORT_WILDCARD = ('NumPy archive (*.npz)|*.npz|Column directory of .npy files (*.columns)|*.columns|'
+                   'Parquet (*.parquet)|*.parquet|Arrow IPC (*.arrow)|*.arrow')
+
+
+def _ext(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def is_column_dir(path):
+    return os.path.isdir(path) and any(f.endswith('.npy') for f in os.listdir(path))
+
+
+def is_columnar(path):
+    return _ext(path) in (NPZ,) + PARQUET + ARROW or is_column_dir(path)
+
+
+def column_format(column):
+    """ Format name from csvparse.FORMATS for a column """
+    if isinstance(column, CategoricalColumn):
+        return CATEGORY
+    kind = column.dtype.kind
+    if kind == 'b':
+        return 'Bool'
+    if kind in 'iu':
+        return 'Int'
+    if kind == 'f':
+        return 'Float'
+    if kind == 'M':
+        return 'Timestamp'
+    if kind == 'S':
+        return 'String'
+    raise ValueError("Unsupported column type %s" % column.dtype)
+
+
+def _category(categories, codes):
+    """ CategoricalColumn with its vocabulary sorted, as catindex needs """
+    categories = np.asarray(categories)
+    order = np.argsort(categories, kind='mergesort')
+    rank = np.empty(len(order), dtype=codes.dtype)
+    rank[order] = np.arange(len(order))
+    return CategoricalColumn(categories[order], rank[codes])
+
+
+def _as_bytes(values):
+    values = np.asarray(values)
+    if values.dtype.kind == 'U':
+        return np.char.encode(values, 'utf-8')
+    return values
+
+
+def _read_arrays(get, keys):
+    """ ColumnTable from arrays get(key), laid out per the manifest if
+        there is one
+    """
+    if MANIFEST not in keys:
+        names = [key for key in keys if key != MANIFEST]
+        columns = []
+        for name in names:
+            column = get(name)
+            if column.dtype.kind == 'O':
+                raise ValueError("Column %s holds Python objects" % name)
+            if column.ndim != 1 or (columns and len(column) != len(columns[0])):
+                raise ValueError("Column %s is not a column of the same length as the others" % name)
+            columns.append(_as_bytes(column))
+        return ColumnTable(names, columns)
+    manifest = json.loads(str(get(MANIFEST)))
+    names = []
+    columns = []
+    for name, fmt, key in manifest:
+        names.append(name)
+        if fmt == CATEGORY:
+            columns.append(_category(get(key + '.categories'), get(key + '.codes')))
+        else:
+            columns.append(get(key))
+    return ColumnTable(names, columns)
+
+
+def _read_npz(path):
+    with np.load(path) as archive:
+        return _read_arrays(lambda key: archive[key], archive.files)
+
+
+def _read_dir(path):
+    files = sorted(f[:-len('.npy')] for f in os.listdir(path) if f.endswith('.npy'))
+
+    def get(key):
+        if key == MANIFEST:
+            with open(os.path.join(path, MANIFEST + '.json')) as f:
+                return f.read()
+        return np.load(os.path.join(path, key + '.npy'), mmap_mode='r')
+    if os.path.exists(os.path.join(path, MANIFEST + '.json')):
+        files.append(MANIFEST)
+    return _read_arrays(get, files)
+
+
+def _pyarrow():
+    """ pyarrow with its ipc and parquet modules, or None. Imported on
+        first use, as it takes long to import and most files are csv.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _from_arrow(column):
+    """ A ChunkedArray as a column of this program """
+    import pyarrow
+    types = pyarrow.types
+    column = column.combine_chunks() if hasattr(column, 'combine_chunks') else column
+    kind = column.type
+    if types.is_dictionary(kind):
+        codes = column.indices.fill_null(0).to_numpy(zero_copy_only=False)
+        categories = _from_arrow(column.dictionary)
+        return _category(categories, codes.astype(np.int64))
+    if types.is_string(kind) or types.is_large_string(kind):
+        values = column.fill_null('').to_numpy(zero_copy_only=False)
+        return np.char.encode(values.astype('U'), 'utf-8')
+    if types.is_binary(kind) or types.is_large_binary(kind):
+        return column.fill_null(b'').to_numpy(zero_copy_only=False).astype('S')
+    if types.is_boolean(kind):
+        return column.fill_null(False).to_numpy(zero_copy_only=False)
+    if types.is_integer(kind) and column.null_count:
+        return column.to_numpy(zero_copy_only=False).astype(float)
+    if types.is_integer(kind) or types.is_floating(kind) or types.is_timestamp(kind) or types.is_date(kind):
+        values = column.to_numpy(zero_copy_only=False)
+        if values.dtype.kind == 'M':
+            values = values.astype('datetime64[ms]')
+        return values
+    raise ValueError("Unsupported column type %s" % kind)
+
+
+def _read_arrow_table(table):
+    return ColumnTable(table.column_names, [_from_arrow(table.column(i))
+                                            for i in range(table.num_columns)])
+
+
+def _need_pyarrow(path):
+    """ Returns pyarrow, or raises IOError if it is not installed """
+    pyarrow = _pyarrow()
+    if pyarrow is None:
+        raise IOError("No module to read %s files (pip install pyarrow)" % _ext(path))
+    return pyarrow
+
+
+def open_table(path):
+    """ Reads a binary column file or directory into a ColumnTable """
+    ext = _ext(path)
+    if os.path.isdir(path):
+        return _read_dir(path)
+    if ext == NPZ:
+        return _read_npz(path)
+    if ext in PARQUET:
+        pyarrow = _need_pyarrow(path)
+        return _read_arrow_table(pyarrow.parquet.read_table(path, memory_map=True))
+    if ext in ARROW:
+        pyarrow = _need_pyarrow(path)
+        with pyarrow.memory_map(path) as source:
+            return _read_arrow_table(pyarrow.ipc.open_file(source).read_all())
+    raise ValueError("Not a column file: %s" % path)
+
+
+def _arrays(data):
+    """ (manifest, {key: array}) for the columns of data """
+    manifest = []
+    arrays = {}
+    for i, name in enumerate(data.names):
+        column = data[name]
+        fmt = column_format(column)
+        key = 'c%d' % i
+        manifest.append([name, fmt, key])
+        if fmt == CATEGORY:
+            arrays[key + '.categories'] = np.asarray(column.categories)
+            arrays[key + '.codes'] = np.asarray(column.codes)
+        else:
+            arrays[key] = np.asarray(column)
+    return manifest, arrays
+
+
+def _to_arrow(column):
+    import pyarrow
+    if isinstance(column, CategoricalColumn):
+        categories = np.char.decode(np.asarray(column.categories), 'utf-8')
+        return pyarrow.DictionaryArray.from_arrays(np.asarray(column.codes), categories)
+    column = np.asarray(column)
+    if column.dtype.kind == 'S':
+        return pyarrow.array(np.char.decode(column, 'utf-8'))
+    return pyarrow.array(column)
+
+
+def export_table(data, path):
+    """ Writes every column of data to path, in the format its extension
+        names; a directory of .npy files for .columns
+    """
+    ext = _ext(path)
+    if ext in PARQUET + ARROW:
+        pyarrow = _need_pyarrow(path)
+        table = pyarrow.table([_to_arrow(data[name]) for name in data.names], names=list(data.names))
+        if ext in PARQUET:
+            pyarrow.parquet.write_table(table, path)
+        else:
+            with pyarrow.OSFile(path, 'wb') as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        return
+    manifest, arrays = _arrays(data)
+    if ext == NPZ:
+        np.savez(path, **dict(arrays, **{MANIFEST: np.array(json.dumps(manifest))}))
+    elif ext == COLUMN_DIR:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for key, array in arrays.items():
+            np.save(os.path.join(path, key + '.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(path, MANIFEST + '.json'), 'w') as f:
+            json.dump(manifest, f)
+    else:
+        raise ValueError("Cannot export to %s files" % (ext or 'extensionless'))
@@ -0,0 +1,170 @@
+"""
+
+Compressed csv input for the data analysis gui.
+Files ending in .gz, .bz2, .xz or .lzma are read through the standard
+library, and .zst when the zstandard module is installed. Decompression
+runs on its own thread, a few blocks ahead of the parser, so the two
+overlap; nothing is written to disk. Blocks are cut at line ends outside
+quoted fields, so every block holds whole rows.
+
+License: this code is in the public domain
+"""
+import bz2
+import gzip
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import numpy as np
+
+
+BLOCK_BYTES = 4 * 1024 * 1024
+QUEUE_BLOCKS = 4
+
+
+def _open_zstd(raw):
+    return zstandard.ZstdDecompressor().stream_reader(raw)
+
+
+OPENERS = {'.gz': lambda raw: gzip.GzipFile(fileobj=raw),
+           '.bz2': bz2.BZ2File}
+if lzma is not None:
+    OPENERS['.xz'] = OPENERS['.lzma'] = lzma.LZMAFile
+if zstandard is not None:
+    OPENERS['.zst'] = _open_zstd
+
+# Every extension that is recognised, opened or not
+EXTENSIONS = ('.gz', '.bz2', '.xz', '.lzma', '.zst')
+WILDCARD = ';'.join('*.csv' + ext for ext in EXTENSIONS)
+
+
+def extension(filename):
+    for ext in EXTENSIONS:
+        if filename.lower().endswith(ext):
+            return ext
+    return None
+
+
+def is_compressed(filename):
+    return extension(filename) is not None
+
+
+def open_file(filename):
+    """ Opens filename for binary reading, decompressing if needed. The
+        underlying file is the raw attribute of the returned stream.
+    """
+    ext = extension(filename)
+    raw = open(filename, 'rb')
+    if ext is None:
+        return raw
+    if ext not in OPENERS:
+        raw.close()
+        raise IOError("No module to read %s files (pip install zstandard)" % ext)
+    stream = OPENERS[ext](raw)
+    stream.raw_file = raw
+    return stream
+
+
+def close(stream):
+    stream.close()
+    raw = getattr(stream, 'raw_file', None)
+    if raw is not None:
+        raw.close()
+
+
+def row_end(data, quotechar=b'"'):
+    """ Offset just past the last newline in data that is not inside a
+        quoted field, or 0. data must start at the start of a row.
+    """
+    if quotechar not in data:
+        return data.rfind(b'\n') + 1
+    buf = np.frombuffer(data, np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    if not len(ends):
+        return 0
+    parity = np.cumsum(buf == ord(quotechar)) % 2
+    ends = ends[parity[ends] == 0]
+    return int(ends[-1]) + 1 if len(ends) else 0
+
+
+class Decompressor(threading.Thread):
+    """ Reads decompressed blocks of a file into a bounded queue """
+    def __init__(self, filename, block_bytes=BLOCK_BYTES):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.stream = open_file(filename)
+        self.block_bytes = block_bytes
+        self.queue = queue.Queue(QUEUE_BLOCKS)
+        self.stopped = threading.Event()
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            while True:
+                block = self.stream.read(self.block_bytes)
+                if not block:
+                    break
+                if not self.put((block, self.stream.raw_file.tell())):
+                    return
+            self.put(None)
+        except Exception as e:
+            self.put(e)
+        finally:
+            close(self.stream)
+
+    def stop(self):
+        self.stopped.set()
+
+
+def iter_blocks(filename, block_bytes=BLOCK_BYTES, skip_lines=1):
+    """ Yields (bytes of whole rows, compressed bytes read so far) for the
+        file after its first skip_lines lines, decompressing on a separate
+        thread
+    """
+    reader = Decompressor(filename, block_bytes)
+    reader.start()
+    carry = b''
+    try:
+        while True:
+            item = reader.queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if item is None:
+                break
+            block, raw_pos = item
+            data = carry + block
+            while skip_lines and b'\n' in data:
+                data = data[data.index(b'\n') + 1:]
+                skip_lines -= 1
+            if skip_lines:
+                carry = data
+                continue
+            end = row_end(data)
+            carry = data[end:]
+            if end:
+                yield data[:end], raw_pos
+        if carry.strip() and not skip_lines:
+            yield carry, raw_pos
+    finally:
+        reader.stop()
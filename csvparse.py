@@ -0,0 +1,286 @@
+"""
+
+Parallel csv parser for the data analysis gui.
+The file is split at line boundaries and the byte ranges are parsed in a
+process pool straight into per-column numpy arrays, which are then joined
+into the named-field layout used by GraphFrame. String columns listed as
+categories are dictionary encoded in the workers.
+
+License: this code is in the public domain
+"""
+import collections
+import csv
+import io
+import mmap
+import multiprocessing
+import os
+
+import numpy as np
+
+import compressed
+from catindex import CATEGORY, CategoricalColumn
+from table import ColumnTable
+
+
+CHUNK_BYTES = 8 * 1024 * 1024
+TRUE_VALUES = ('true', 't', 'yes', 'y', '1')
+COUNT_WINDOW = 16 * 1024 * 1024
+
+# Parameter formats as chosen in the gui and the dtype each is parsed to
+FORMATS = {'String': 'S100', 'Int': int, 'Float': float,
+           'Bool': np.bool_, 'Timestamp': 'datetime64[ms]',
+           CATEGORY: 'S100'}
+
+
+def make_dtype(columns):
+    """ Returns (dtype, category names) for a list of (name, format) """
+    dt = np.dtype({'names': [name for name, fmt in columns],
+                   'formats': [FORMATS[fmt] for name, fmt in columns]})
+    return dt, [name for name, fmt in columns if fmt == CATEGORY]
+
+
+def _count(mm, start, end, char):
+    """ Counts char in mm[start:end] without copying the whole range """
+    n = 0
+    while start < end:
+        stop = min(start + COUNT_WINDOW, end)
+        n += mm[start:stop].count(char)
+        start = stop
+    return n
+
+
+def _line_end(mm, start, end, size, quote):
+    """ Returns the offset just past the first newline at or after end that
+        closes the range started at start outside of a quoted field.
+    """
+    if end >= size:
+        return size
+    nl = mm.find(b'\n', end)
+    if nl < 0:
+        return size
+    stop = nl + 1
+    quotes = _count(mm, start, stop, quote)
+    while quotes % 2:
+        nl = mm.find(b'\n', stop)
+        if nl < 0:
+            return size
+        quotes += _count(mm, stop, nl + 1, quote)
+        stop = nl + 1
+    return stop
+
+
+def header_end(filename, skip_lines=1):
+    """ Byte offset of the first data line, in the decompressed data for a
+        compressed file
+    """
+    f = compressed.open_file(filename)
+    try:
+        for i in range(skip_lines):
+            f.readline()
+        return f.tell()
+    finally:
+        compressed.close(f)
+
+
+def split_ranges(filename, chunk_bytes=CHUNK_BYTES, skip_lines=1, quotechar='"'):
+    """ Returns (start, end) byte ranges of about chunk_bytes covering the
+        file after the first skip_lines lines. Every range ends on a newline
+        that is not inside a quoted field.
+    """
+    size = os.path.getsize(filename)
+    start = header_end(filename, skip_lines)
+    if start >= size:
+        return []
+    quote = quotechar.encode('ascii')
+    ranges = []
+    with open(filename, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            while start < size:
+                end = _line_end(mm, start, start + chunk_bytes, size, quote)
+                ranges.append((start, end))
+                start = end
+        finally:
+            mm.close()
+    return ranges
+
+
+def _split_rows(text, ncols):
+    """ Splits quoted csv text into rows of fields """
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    for i, row in enumerate(rows):
+        if len(row) != ncols:
+            raise ValueError("Wrong number of columns in row %d of chunk: %d, expected %d"
+                             % (i, len(row), ncols))
+    return rows
+
+
+def to_bool(field):
+    """ loadtxt converter for Bool columns """
+    if isinstance(field, bytes):
+        field = field.decode('utf-8')
+    return field.strip().lower() in TRUE_VALUES
+
+
+def convert_column(values, fmt):
+    """ Converts a sequence of field strings to an array of dtype fmt """
+    fmt = np.dtype(fmt)
+    if fmt.kind == 'b':
+        return np.isin(np.char.lower(np.char.strip(np.array(values, dtype='U'))), TRUE_VALUES)
+    if fmt.kind == 'S':
+        return np.char.encode(np.array(values, dtype='U'), 'utf-8').astype(fmt)
+    return np.array(values, dtype=fmt)
+
+
+def parse_text(text, dt):
+    """ Parses csv text into a list of arrays, one per field of dt. Chunks
+        without quotes go through np.loadtxt, the rest through the csv module.
+    """
+    if '"' not in text:
+        converters = dict((i, to_bool) for i, name in enumerate(dt.names)
+                          if dt[name].kind == 'b')
+        records = np.loadtxt(io.StringIO(text), dt, delimiter=',', ndmin=1,
+                             converters=converters or None)
+        return [np.ascontiguousarray(records[name]) for name in dt.names]
+    rows = _split_rows(text, len(dt.names))
+    if not rows:
+        return [np.zeros(0, dt[name]) for name in dt.names]
+    columns = list(zip(*rows))
+    return [convert_column(columns[i], dt[name]) for i, name in enumerate(dt.names)]
+
+
+def parse_range(args):
+    """ Pool worker: parses bytes start:end of filename """
+    filename, start, end, dt, categories = args
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_block((data, end, dt, categories))
+
+
+def parse_block(args):
+    """ Pool worker: parses the csv bytes data, returning them with end """
+    data, end, dt, categories = args
+    columns = parse_text(data.decode('utf-8', 'replace'), dt)
+    for i, name in enumerate(dt.names):
+        if name in categories:
+            columns[i] = CategoricalColumn.encode(columns[i])
+    return columns, end
+
+
+def parse_column_text(text, col, ncols, fmt):
+    """ Parses field col of every line of csv text into an array of fmt """
+    fmt = np.dtype(fmt)
+    if '"' not in text:
+        converters = {col: to_bool} if fmt.kind == 'b' else None
+        return np.loadtxt(io.StringIO(text), fmt, delimiter=',', usecols=(col,), ndmin=1,
+                          converters=converters)
+    rows = _split_rows(text, ncols)
+    return convert_column([row[col] for row in rows], fmt)
+
+
+def parse_column_range(args):
+    """ Pool worker: parses one column from bytes start:end of filename """
+    filename, start, end, col, ncols, fmt, category = args
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', 'replace')
+    column = parse_column_text(text, col, ncols, fmt)
+    if category:
+        column = CategoricalColumn.encode(column)
+    return column
+
+
+def to_records(dt, pieces):
+    """ Joins lists of per-column arrays into one structured array """
+    out = np.empty(sum(len(piece[0]) for piece in pieces), dt)
+    if not pieces:
+        return out
+    for i, name in enumerate(dt.names):
+        if len(pieces) == 1:
+            out[name] = pieces[0][i]
+        else:
+            out[name] = np.concatenate([piece[i] for piece in pieces])
+    return out
+
+
+def join_columns(dt, pieces, categories=()):
+    """ Joins lists of per-column arrays into one list of columns """
+    columns = []
+    for i, name in enumerate(dt.names):
+        if name in categories:
+            if not pieces:
+                columns.append(CategoricalColumn.encode(np.zeros(0, dt[name])))
+            else:
+                columns.append(CategoricalColumn.concat([piece[i] for piece in pieces]))
+        elif len(pieces) == 1:
+            columns.append(pieces[0][i])
+        else:
+            columns.append(np.concatenate([piece[i] for piece in pieces] or [np.zeros(0, dt[name])]))
+    return columns
+
+
+def iter_parse(filename, dt, skip_lines=1, processes=None, chunk_bytes=CHUNK_BYTES, categories=()):
+    """ Yields (columns, end offset) for each chunk of the file in order.
+        For a compressed file the offset is into the compressed file, and
+        chunks are decompressed on a thread while earlier ones are parsed.
+        Closing the generator early terminates the worker pool.
+    """
+    if compressed.is_compressed(filename):
+        blocks = compressed.iter_blocks(filename, chunk_bytes, skip_lines)
+        jobs = ((data, end, dt, tuple(categories)) for data, end in blocks)
+        return imap(parse_block, jobs, processes)
+    ranges = split_ranges(filename, chunk_bytes, skip_lines)
+    jobs = [(filename, start, end, dt, tuple(categories)) for start, end in ranges]
+    return imap(parse_range, jobs, processes)
+
+
+def iter_parse_column(filename, ranges, col, ncols, fmt, category=False, processes=None):
+    """ Yields field col parsed from each (start, end) byte range in order """
+    jobs = [(filename, start, end, col, ncols, fmt, category) for start, end in ranges]
+    return imap(parse_column_range, jobs, processes)
+
+
+def imap(func, jobs, processes=None):
+    """ Yields func(job) for every job in order, from a process pool when
+        there is more than one job. jobs may be an iterator, which is read
+        only a few jobs ahead of the results. Closing the generator early
+        terminates the pool.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if isinstance(jobs, list):
+        processes = min(processes, len(jobs))
+    if processes <= 1:
+        for job in jobs:
+            yield func(job)
+        return
+    pool = multiprocessing.Pool(processes)
+    pending = collections.deque()
+    try:
+        for job in jobs:
+            pending.append(pool.apply_async(func, (job,)))
+            if len(pending) > processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parse_file(filename, dt, skip_lines=1, processes=None, chunk_bytes=CHUNK_BYTES):
+    """ Parses the whole file into a structured array of dtype dt """
+    pieces = [columns for columns, end in
+              iter_parse(filename, dt, skip_lines, processes, chunk_bytes)]
+    return to_records(dt, pieces)
+
+
+def parse_table(filename, dt, skip_lines=1, processes=None, chunk_bytes=CHUNK_BYTES, categories=()):
+    """ Parses the whole file into a ColumnTable, dictionary encoding the
+        columns named in categories
+    """
+    pieces = [columns for columns, end in
+              iter_parse(filename, dt, skip_lines, processes, chunk_bytes, categories)]
+    return ColumnTable(dt.names, join_columns(dt, pieces, categories))
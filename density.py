@@ -0,0 +1,74 @@
+"""
+
+Density plots for the data analysis gui.
+Instead of drawing every point of a column against an X that is not
+sorted, the rows are counted per pixel of the axes with bincount on a
+row * width + column key, going through the rows in chunks of CHUNK_ROWS
+so memory stays bounded, and the counts are shown as an image with log or
+histogram equalized colours. The cost of drawing then depends on the
+number of pixels, not of rows, and the counts are redone on zoom.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+from groupby import as_float
+
+
+CHUNK_ROWS = 1024 * 1024
+# Rows from which Auto draws a column as a density when X is not sorted
+AUTO_ROWS = 100000
+
+MODES = ('Auto', 'Lines', 'Density (log)', 'Density (eq. hist)')
+SHADES = {'Auto': 'log', 'Density (log)': 'log', 'Density (eq. hist)': 'eq_hist'}
+
+
+def can_bin(column):
+    return getattr(column, 'dtype', None) is not None and column.dtype.kind in 'iufM'
+
+
+def histogram(x, y, rows, xrange, yrange, width, height, mask=None):
+    """ Number of the rows (a slice or row numbers) in each cell of a
+        height x width grid over xrange and yrange, row 0 at the bottom.
+        Rows outside the ranges, with NaN or rejected by mask are not
+        counted.
+    """
+    xmin, xmax = xrange
+    ymin, ymax = yrange
+    xscale = width / (float(xmax - xmin) or 1.)
+    yscale = height / (float(ymax - ymin) or 1.)
+    if isinstance(rows, slice):
+        start, stop, _ = rows.indices(len(x))
+        pieces = (slice(lo, min(lo + CHUNK_ROWS, stop)) for lo in range(start, stop, CHUNK_ROWS))
+    else:
+        pieces = (rows[lo:lo + CHUNK_ROWS] for lo in range(0, len(rows), CHUNK_ROWS))
+
+    counts = np.zeros(width * height, dtype=np.int64)
+    for piece in pieces:
+        col = np.floor((as_float(x[piece]) - xmin) * xscale)
+        row = np.floor((as_float(y[piece]) - ymin) * yscale)
+        keep = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+        if mask is not None:
+            keep &= mask[piece]
+        key = row[keep].astype(np.int64) * width + col[keep].astype(np.int64)
+        counts += np.bincount(key, minlength=width * height)
+    return counts.reshape(height, width)
+
+
+def shade(counts, how='log'):
+    """ Values for a colormap from counts: NaN, drawn transparent, where
+        there are no rows, otherwise the log of the count for 'log', or for
+        'eq_hist' the share of the filled cells with a count no higher, so
+        every colour covers about as many cells
+    """
+    image = np.full(counts.shape, np.nan)
+    filled = counts > 0
+    if how == 'log':
+        image[filled] = np.log1p(counts[filled])
+    elif how == 'eq_hist':
+        values, inverse = np.unique(counts[filled], return_inverse=True)
+        cdf = np.cumsum(np.bincount(inverse.ravel())) / float(max(filled.sum(), 1))
+        image[filled] = cdf[inverse.ravel()]
+    else:
+        raise ValueError("Unknown shading %s" % how)
+    return image
@@ -0,0 +1,324 @@
+"""
+
+Data engine for the data analysis gui.
+Loading, column type inference, ID indexing and the preparation of the
+plotted series, with no wx or pylab dependency, so they can be used
+headless (batch.py) and benchmarked. numpy and the modules built on it are
+imported on first use, which keeps importing the engine itself cheap.
+
+License: this code is in the public domain
+"""
+import os
+import threading
+import time
+
+import perf
+
+
+def make_dtype(columns):
+    """ Returns (dtype, category names) for a list of (name, format) """
+    import csvparse
+    with perf.stage('build dtype'):
+        return csvparse.make_dtype(columns)
+
+
+def infer_columns(filename, full=False):
+    """ Returns (header, [(format, confidence, values seen)]) from a sample
+        of the file, or from every line if full
+    """
+    import infer
+    with perf.stage('infer types'):
+        if full:
+            return infer.infer_file(filename)
+        return infer.infer_sample(filename)
+
+
+def load(filename, columns, processes=None, skip_lines=1):
+    """ Parses filename into a ColumnTable. columns is a list of
+        (name, format) with formats from csvparse.FORMATS.
+    """
+    import csvparse
+    dt, categories = csvparse.make_dtype(columns)
+    return csvparse.parse_table(filename, dt, skip_lines, processes, categories=categories)
+
+
+def open_lazy(filename, columns, cache=None, progress=None, skip_lines=1):
+    """ Indexes the rows of filename and returns a lazy.LazyTable whose
+        columns are parsed on first use, or None if progress stopped it
+    """
+    import lazy
+    with perf.stage('row index'):
+        index = lazy.RowIndex.build(filename, skip_lines, progress)
+    if index is None:
+        return None
+    return lazy.LazyTable(filename, columns, index, cache, skip_lines=skip_lines)
+
+
+class Loader(threading.Thread):
+    """ Parses a data file in chunks on a worker thread, using a process
+        pool from csvparse for the chunks themselves. Columns named in
+        categories are dictionary encoded. The rows read so far are
+        available from snapshot().
+
+        notify(event, *args) is called from the worker thread with
+            'progress', loader, bytes read, total bytes, rows, seconds
+            'done', loader, table, seconds
+            'cancelled', loader
+            'error', loader, message
+        If a column cache is given the finished columns are written to it
+        and handed back memory mapped from there.
+    """
+    chunk_bytes = 4 * 1024 * 1024
+
+    def __init__(self, filename, dt, notify, categories=(), cache=None):
+        import csvparse
+        from table import ColumnTable
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.filename = filename
+        self.dt = dt
+        self.notify = notify
+        self.categories = categories
+        self.cache = cache
+        self.pieces = []
+        self.end = csvparse.header_end(filename)
+        self.table = ColumnTable(dt.names, csvparse.join_columns(dt, [], categories))
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def snapshot(self):
+        import csvparse
+        from table import ColumnTable
+        with self.lock:
+            if not self.pieces:
+                return self.table
+            with perf.stage('join chunks'):
+                if len(self.table):
+                    self.pieces.insert(0, [self.table[name] for name in self.dt.names])
+                self.table = ColumnTable(self.dt.names,
+                                         csvparse.join_columns(self.dt, self.pieces, self.categories))
+                self.pieces = []
+            return self.table
+
+    def run(self):
+        """ Parses the file, notifying 'progress' per chunk and then one of
+            'done', 'cancelled' or 'error', whatever goes wrong on the way
+        """
+        try:
+            self.load()
+        except Exception as e:
+            self.notify('error', self, str(e))
+
+    def load(self):
+        import csvparse
+        start = time.time()
+        total = os.path.getsize(self.filename)
+        rows = 0
+        parser = csvparse.iter_parse(self.filename, self.dt, chunk_bytes=self.chunk_bytes,
+                                     categories=self.categories)
+        try:
+            with perf.stage('parse file'):
+                for columns, nbytes in parser:
+                    with self.lock:
+                        self.pieces.append(columns)
+                    self.end = nbytes
+                    rows += len(columns[0])
+                    self.notify('progress', self, nbytes, total, rows, time.time() - start)
+                    if self.cancelled.is_set():
+                        break
+        finally:
+            parser.close()
+        if self.cancelled.is_set():
+            self.notify('cancelled', self)
+            return
+        data = self.snapshot()
+        if self.cache is not None:
+            try:
+                with perf.stage('cache write'):
+                    data = self.cache.put(self.filename, data)
+            except (IOError, OSError):
+                pass
+        import colstats
+        with perf.stage('column stats'):
+            colstats.table_stats(data)
+        self.notify('done', self, data, time.time() - start)
+
+
+class DataView(object):
+    """ A loaded table plus what is built from its columns on demand: the
+        row numbers used when no X column is chosen, LOD pyramids,
+        categorical indexes and the masks of row filters, by expression.
+        Column statistics are kept with the table, as they are computed at
+        load. A new view is made whenever the table changes.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.rows = None
+        self.pyramids = {}
+        self.indexes = {}
+        self.masks = {}
+        self.local_stats = {}
+
+    def xdata(self, xname):
+        """ Column xname, or the row numbers when xname is None. These are
+            a slice of a range that grows by doubling and is passed on to
+            extended views, so following a file does not rebuild it.
+        """
+        if xname is not None:
+            return self.data[xname]
+        n = len(self.data)
+        if self.rows is None or len(self.rows) < n:
+            import numpy as np
+            self.rows = np.arange(max(n, 2 * len(self.rows) if self.rows is not None else 0))
+        return self.rows[:n]
+
+    def stats(self, name):
+        """ colstats.ColumnStats of a numeric column, or None """
+        stats = getattr(self.data, 'stats', self.local_stats)
+        if name not in stats:
+            import colstats
+            column = self.data[name]
+            with perf.stage('column stats'):
+                stats[name] = colstats.ColumnStats.of(column) if colstats.has_stats(column) else None
+        return stats[name]
+
+    def is_monotonic(self, xname):
+        """ True if the X column is numeric and never decreasing """
+        if xname is None:
+            return True
+        stats = self.stats(xname)
+        return stats is not None and stats.sorted
+
+    def auto_xmax(self, xname):
+        x = self.xdata(xname)
+        if not len(x):
+            return 1
+        if xname is None:
+            return x[-1]
+        stats = self.stats(xname)
+        if stats is not None:
+            return stats.max
+        import numpy as np
+        return np.max(x)
+
+    def view_rows(self, xname, xmin, xmax):
+        """ Rows that can hold X values in [xmin, xmax]: a binary searched
+            slice for a sorted X, the overlapping zones otherwise
+        """
+        import lod
+        if self.is_monotonic(xname):
+            return slice(*lod.view_rows(self.xdata(xname), xmin, xmax))
+        stats = self.stats(xname)
+        if stats is None:
+            return slice(None)
+        return stats.zone_rows(xmin, xmax)
+
+    def mask(self, row_filter):
+        """ Boolean mask of the rows passing a rowfilter.RowFilter, or None
+            for no filter. Masks are kept by expression.
+        """
+        if row_filter is None:
+            return None
+        if row_filter.key not in self.masks:
+            with perf.stage('row filter'):
+                self.masks[row_filter.key] = (row_filter, row_filter.evaluate(self.data))
+        return self.masks[row_filter.key][1]
+
+    def filtered(self, name, row_filter):
+        """ Column name as floats with NaN in the rows the filter rejects,
+            so lines break there, or the column itself for no filter
+        """
+        column = self.data[name]
+        if row_filter is None:
+            return column
+        import numpy as np
+        return np.where(self.mask(row_filter), column, np.nan)
+
+    def series(self, xname, yname, xmin, xmax, width, decimate=True, row_filter=None):
+        """ Returns the (x, y) points of column yname to plot between xmin
+            and xmax, reduced to min/max pairs per pixel column over width
+            pixels when X is monotonic. Otherwise only the rows that
+            view_rows() selects are returned. Rows rejected by row_filter
+            are left out.
+        """
+        import lod
+        x = self.xdata(xname)
+        y = self.data[yname]
+        if not decimate or not lod.can_decimate(y) or not self.is_monotonic(xname):
+            rows = self.view_rows(xname, xmin, xmax)
+            mask = self.mask(row_filter)
+            if mask is None:
+                return x[rows], y[rows]
+            keep = mask[rows]
+            return x[rows][keep], y[rows][keep]
+        key = (yname, row_filter.key if row_filter is not None else None)
+        if key not in self.pyramids:
+            with perf.stage('build pyramid'):
+                self.pyramids[key] = lod.Pyramid(self.filtered(yname, row_filter))
+        with perf.stage('decimate'):
+            return lod.decimate(x, self.pyramids[key], xmin, xmax, width)
+
+    def density(self, xname, yname, xmin, xmax, ymin, ymax, width, height, row_filter=None):
+        """ Rows of column yname per cell of a width x height grid over the
+            view, see density.histogram. Only the rows that view_rows()
+            selects are looked at.
+        """
+        import density
+        rows = self.view_rows(xname, xmin, xmax)
+        mask = self.mask(row_filter)
+        with perf.stage('density'):
+            return density.histogram(self.xdata(xname), self.data[yname], rows,
+                                     (xmin, xmax), (ymin, ymax), width, height, mask)
+
+    def category_index(self, name):
+        if name not in self.indexes:
+            import catindex
+            column = self.data[name]
+            with perf.stage('categorical index'):
+                if isinstance(column, catindex.CategoricalColumn):
+                    self.indexes[name] = column.index()
+                else:
+                    self.indexes[name] = catindex.CategoricalIndex.from_values(column)
+        return self.indexes[name]
+
+    def retain(self, names):
+        """ Drops the pyramids and indexes of columns not in names, so a
+            lazily loaded table can release them
+        """
+        for name in list(self.indexes):
+            if name not in names:
+                del self.indexes[name]
+        for key in list(self.pyramids):
+            if key[0] not in names:
+                del self.pyramids[key]
+
+    def extended(self, data):
+        """ Returns the view of data, which holds the rows of this view's
+            table followed by appended rows. Pyramids, filter masks,
+            categorical indexes and column statistics are extended, looking
+            at the new rows only.
+        """
+        import numpy as np
+        view = DataView(data)
+        view.rows = self.rows
+        for name, index in self.indexes.items():
+            with perf.stage('categorical index'):
+                view.indexes[name] = index.extended(data[name])
+        for key, (row_filter, mask) in self.masks.items():
+            view.masks[key] = (row_filter, np.concatenate((mask, row_filter.evaluate(data, len(mask)))))
+        for key, pyramid in self.pyramids.items():
+            name, filter_key = key
+            if filter_key is None:
+                pyramid.update(data[name])
+            else:
+                pyramid.update(view.filtered(name, view.masks[filter_key][0]))
+            view.pyramids[key] = pyramid
+        new_stats = getattr(data, 'stats', view.local_stats)
+        for name, stats in getattr(self.data, 'stats', self.local_stats).items():
+            if stats is not None:
+                stats.update(data[name])
+            new_stats[name] = stats
+        return view
@@ -0,0 +1,122 @@
+"""
+
+Per ID series for the data analysis gui.
+Aggregates of Y over bins of X (count, mean, minimum and maximum) are
+computed for all selected IDs at once with bincount and ufunc.at on a
+group * bins + bin key, so there is no Python loop over rows, only one over
+the groups being drawn. When the selected IDs hold few of the rows their
+rows are gathered from the categorical index, which keeps every ID's rows
+together; otherwise the columns are scanned in place with a code to group
+lookup. With a sorted X only the rows between xmin and xmax are touched.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+
+MODES = ('Markers', 'Series', 'Mean', 'Envelope', 'Count')
+
+
+def as_float(values):
+    if values.dtype.kind == 'M':
+        values = values.view(np.int64)
+    return np.asarray(values, dtype=float)
+
+
+class GroupBins(object):
+    """ Y of the groups codes of index, with aggregates over bins equal
+        parts of xmin:xmax. Arrays of aggregates have one row per group and
+        are NaN (count 0) for empty bins.
+    """
+    def __init__(self, index, codes, x, y, xmin, xmax, bins, monotonic=False):
+        self.index = index
+        self.codes = np.asarray(codes, dtype=int)
+        self.x = x
+        self.y = y
+        self.bins = bins
+        self.edges = np.linspace(xmin, xmax, bins + 1)
+        self.centers = (self.edges[:-1] + self.edges[1:]) / 2
+
+        groups = len(self.codes)
+        lo, hi = 0, len(x)
+        if monotonic:
+            lo, hi = np.searchsorted(x, [xmin, xmax], side='right')
+            lo = max(lo - 1, 0)
+        if int(index.counts[self.codes].sum()) * 8 < hi - lo:
+            rows, lengths = index.group_rows(self.codes)
+            if monotonic:
+                inside = (rows >= lo) & (rows < hi)
+                group = np.repeat(np.arange(groups), lengths)[inside]
+                rows = rows[inside]
+            else:
+                group = np.repeat(np.arange(groups), lengths)
+            xs, ys = as_float(x[rows]), as_float(y[rows])
+        else:
+            lookup = np.full(len(index), -1, dtype=np.int64)
+            lookup[self.codes] = np.arange(groups)
+            group = lookup[index.codes[lo:hi]]
+            xs, ys = as_float(x[lo:hi]), as_float(y[lo:hi])
+
+        span = float(xmax - xmin) or 1.
+        bin = np.floor((xs - xmin) * (bins / span)).astype(np.int64)
+        keep = (group >= 0) & (bin >= 0) & (bin < bins) & ~np.isnan(ys)
+        key = group[keep] * bins + bin[keep]
+        ys = ys[keep]
+
+        size = groups * bins
+        counts = np.bincount(key, minlength=size)
+        sums = np.bincount(key, weights=ys, minlength=size)
+        mins = np.full(size, np.inf)
+        maxs = np.full(size, -np.inf)
+        np.minimum.at(mins, key, ys)
+        np.maximum.at(maxs, key, ys)
+        empty = counts == 0
+        mins[empty] = np.nan
+        maxs[empty] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = sums / counts
+        self.count = counts.reshape(groups, bins)
+        self.mean = mean.reshape(groups, bins)
+        self.min = mins.reshape(groups, bins)
+        self.max = maxs.reshape(groups, bins)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def points(self, i):
+        """ (x, y) of every row of group i """
+        rows = self.index.rows(self.codes[i])
+        return as_float(self.x[rows]), as_float(self.y[rows])
+
+    def series(self, i):
+        """ Points of group i to draw as a line: its rows if there are no
+            more than two per bin, otherwise the minimum and maximum of every
+            bin, so peaks stay visible
+        """
+        if self.index.counts[self.codes[i]] <= 2 * self.bins:
+            return np.column_stack(self.points(i))
+        filled = self.count[i] > 0
+        xs = np.repeat(self.centers[filled], 2)
+        ys = np.column_stack((self.min[i][filled], self.max[i][filled])).ravel()
+        return np.column_stack((xs, ys))
+
+    def lines(self, mode):
+        """ One (n, 2) array of vertices per group for mode """
+        if mode == 'Series':
+            return [self.series(i) for i in range(len(self))]
+        values = self.count if mode == 'Count' else self.mean
+        lines = []
+        for row, count in zip(values, self.count):
+            filled = count > 0
+            lines.append(np.column_stack((self.centers[filled], row[filled])))
+        return lines
+
+    def envelopes(self):
+        """ One polygon per group around its minimum and maximum """
+        polygons = []
+        for mins, maxs, count in zip(self.min, self.max, self.count):
+            filled = count > 0
+            xs = self.centers[filled]
+            polygons.append(np.column_stack((np.concatenate((xs, xs[::-1])),
+                                             np.concatenate((mins[filled], maxs[filled][::-1])))))
+        return polygons
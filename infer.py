@@ -0,0 +1,188 @@
+"""
+
+Column type inference for the data analysis gui.
+Types are guessed from a bounded sample of the file (the head plus a few
+runs of lines at random offsets), so the cost does not depend on the file
+size. infer_file() does the same over every line when asked for. String
+columns with few distinct values are suggested as Category (dictionary
+encoded).
+
+License: this code is in the public domain
+"""
+import csv
+import io
+import os
+import random
+import re
+
+import compressed
+
+
+HEAD_LINES = 200
+SEEKS = 8
+SEEK_LINES = 25
+DISTINCT_CAP = 4096
+CATEGORY_MIN_VALUES = 20
+CATEGORY_RATIO = 0.25
+
+BOOL_VALUES = ('true', 'false', 't', 'f', 'yes', 'no')
+INT_RE = re.compile(r'^\s*[+-]?\d+\s*$')
+TIMESTAMP_RE = re.compile(r'^\s*\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?\s*$')
+
+# Narrowest first. A value that parses as one type also counts towards the
+# types listed after it in its own chain (Int values are valid Floats).
+TYPES = ('Bool', 'Int', 'Float', 'Timestamp')
+
+
+def classify(value):
+    """ Returns the set of types value parses as """
+    if value.strip().lower() in BOOL_VALUES:
+        return ('Bool',)
+    if INT_RE.match(value):
+        return ('Int', 'Float')
+    if TIMESTAMP_RE.match(value):
+        return ('Timestamp',)
+    try:
+        float(value)
+    except ValueError:
+        return ()
+    return ('Float',)
+
+
+class TypeCounter(object):
+    """ Accumulates per-column type counts over rows of fields """
+
+    def __init__(self, ncols):
+        self.ncols = ncols
+        self.counts = [dict((t, 0) for t in TYPES) for i in range(ncols)]
+        self.values = [0] * ncols
+        self.distinct = [set() for i in range(ncols)]
+        # Columns with more than DISTINCT_CAP values are not categories
+        self.overflow = [False] * ncols
+
+    def add(self, rows):
+        for row in rows:
+            if len(row) != self.ncols:
+                continue
+            for i, value in enumerate(row):
+                if not value.strip():
+                    continue
+                self.values[i] += 1
+                for t in classify(value):
+                    self.counts[i][t] += 1
+                if not self.overflow[i] and value not in self.distinct[i]:
+                    if len(self.distinct[i]) < DISTINCT_CAP:
+                        self.distinct[i].add(value)
+                    else:
+                        self.overflow[i] = True
+
+    def result(self):
+        """ Returns a (type, confidence, values seen) tuple per column. The
+            confidence is the share of values consistent with the type.
+        """
+        out = []
+        for counts, n, distinct, overflow in zip(self.counts, self.values, self.distinct, self.overflow):
+            if n == 0:
+                out.append(('String', 0.0, 0))
+                continue
+            for t in TYPES:
+                if counts[t] == n:
+                    out.append((t, 1.0, n))
+                    break
+            else:
+                if not overflow and n >= CATEGORY_MIN_VALUES and len(distinct) <= CATEGORY_RATIO * n:
+                    format = 'Category'
+                else:
+                    format = 'String'
+                # Every value is a valid String
+                out.append((format, 1.0, n))
+        return out
+
+
+def _rows(lines):
+    text = b''.join(lines).decode('utf-8', 'replace')
+    return csv.reader(io.StringIO(text))
+
+
+def read_header(filename):
+    f = compressed.open_file(filename)
+    try:
+        line = f.readline().decode('utf-8', 'replace')
+    finally:
+        compressed.close(f)
+    return [h.strip() for h in next(csv.reader([line]))]
+
+
+def sample_lines(filename, head=HEAD_LINES, seeks=SEEKS, seek_lines=SEEK_LINES, seed=0):
+    """ Returns the first head data lines and seek_lines lines after each
+        of seeks random offsets, skipping the header line. Compressed files
+        cannot be seeked cheaply, so the same number of lines is taken from
+        their head instead.
+    """
+    if compressed.is_compressed(filename):
+        return head_lines(filename, head + seeks * seek_lines)
+    size = os.path.getsize(filename)
+    rng = random.Random(seed)
+    lines = []
+    with open(filename, 'rb') as f:
+        f.readline()
+        for i in range(head):
+            line = f.readline()
+            if not line:
+                return lines
+            lines.append(line)
+        start = f.tell()
+        if start >= size:
+            return lines
+        for offset in sorted(rng.randint(start, size - 1) for i in range(seeks)):
+            if offset < f.tell():
+                continue
+            f.seek(offset)
+            f.readline()
+            for i in range(seek_lines):
+                line = f.readline()
+                if not line:
+                    break
+                lines.append(line)
+    return lines
+
+
+def head_lines(filename, n):
+    """ Returns the first n data lines, skipping the header line """
+    f = compressed.open_file(filename)
+    try:
+        f.readline()
+        lines = []
+        for i in range(n):
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+        return lines
+    finally:
+        compressed.close(f)
+
+
+def infer_sample(filename, **kwargs):
+    """ Returns (header, [(type, confidence, values seen)]) from a sample """
+    header = read_header(filename)
+    counter = TypeCounter(len(header))
+    counter.add(_rows(sample_lines(filename, **kwargs)))
+    return header, counter.result()
+
+
+def infer_file(filename, block_lines=100000):
+    """ Same as infer_sample but over every line of the file """
+    header = read_header(filename)
+    counter = TypeCounter(len(header))
+    f = compressed.open_file(filename)
+    try:
+        f.readline()
+        while True:
+            lines = f.readlines(block_lines * 64)
+            if not lines:
+                break
+            counter.add(_rows(lines))
+    finally:
+        compressed.close(f)
+    return header, counter.result()
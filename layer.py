@@ -0,0 +1,135 @@
+"""
+
+Off-screen rendering of the plotted lines for the data analysis gui.
+The lines and collections of the plot are copied, sharing their data, into
+a private figure the size of the axes and drawn with Agg on a worker thread
+into a transparent RGBA image, which the gui thread then blits over the
+cached axes background. Agg keeps the GIL while it draws a path, so long
+lines are split into pieces of CHUNK_POINTS points and the gui thread runs
+between them. Only the newest request is rendered: requests made while a
+render runs replace each other, and a render that is overtaken by a newer
+request is abandoned between pieces instead of delivered.
+
+License: this code is in the public domain
+"""
+import threading
+
+import numpy as np
+
+import perf
+
+
+CHUNK_POINTS = 50000
+
+
+def detach(artist):
+    """ Copies of a plotted line or collection that belong to no axes, a
+        line being split into pieces that overlap by one point. Lines are
+        copied in display units, so unit conversion (dates) is not needed
+        again off-screen.
+    """
+    from matplotlib.collections import LineCollection, PolyCollection
+    from matplotlib.lines import Line2D
+    if isinstance(artist, Line2D):
+        xy = artist.get_xydata()
+        copies = [Line2D(xy[lo:lo + CHUNK_POINTS + 1, 0], xy[lo:lo + CHUNK_POINTS + 1, 1])
+                  for lo in range(0, max(len(xy) - 1, 1), CHUNK_POINTS)]
+    elif isinstance(artist, LineCollection):
+        copies = [LineCollection(artist.get_segments())]
+    elif isinstance(artist, PolyCollection):
+        copies = [PolyCollection([path.vertices for path in artist.get_paths()])]
+    else:
+        raise TypeError("Cannot render %s off-screen" % type(artist).__name__)
+    for copy in copies:
+        copy.update_from(artist)
+        copy.set_animated(False)
+    return copies
+
+
+class Frame(object):
+    """ What to render: detached artists over xlim and ylim on an image of
+        width x height pixels
+    """
+    def __init__(self, generation, artists, width, height, dpi, xlim, ylim):
+        self.generation = generation
+        self.artists = artists
+        self.width = max(int(round(width)), 1)
+        self.height = max(int(round(height)), 1)
+        self.dpi = dpi
+        self.xlim = xlim
+        self.ylim = ylim
+
+
+def render(frame, is_stale=None):
+    """ Draws frame with Agg. Returns an RGBA array, height x width x 4,
+        transparent where nothing was drawn, or None if is_stale() became
+        true on the way.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    with perf.stage('render lines'):
+        fig = Figure((frame.width / float(frame.dpi), frame.height / float(frame.dpi)), dpi=frame.dpi)
+        canvas = FigureCanvasAgg(fig)
+        axes = fig.add_axes([0, 0, 1, 1])
+        axes.set_xlim(frame.xlim)
+        axes.set_ylim(frame.ylim)
+        renderer = canvas.get_renderer()
+        renderer.clear()
+        for artist in frame.artists:
+            if is_stale is not None and is_stale():
+                return None
+            artist.set_transform(axes.transData)
+            axes.add_artist(artist)
+            artist.set_clip_path(axes.patch)
+            artist.draw(renderer)
+        return np.asarray(renderer.buffer_rgba()).copy()
+
+
+class LayerRenderer(object):
+    """ Renders frames on a worker thread. deliver(generation, image) is
+        called on that thread with the image of the newest frame, or with
+        the exception raised while rendering it.
+    """
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self.condition = threading.Condition()
+        self.pending = None
+        self.latest = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, artists, width, height, dpi, xlim, ylim):
+        """ Queues a frame in place of any frame not yet started. Returns
+            its generation number.
+        """
+        with self.condition:
+            self.latest += 1
+            self.pending = Frame(self.latest, artists, width, height, dpi, tuple(xlim), tuple(ylim))
+            self.condition.notify()
+            return self.latest
+
+    def is_stale(self, generation):
+        with self.condition:
+            return generation != self.latest
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                frame, self.pending = self.pending, None
+            try:
+                image = render(frame, lambda: self.is_stale(frame.generation))
+            except Exception as e:
+                image = e
+            if image is not None and not self.is_stale(frame.generation):
+                self.deliver(frame.generation, image)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
@@ -0,0 +1,201 @@
+"""
+
+Lazily parsed tables for files larger than memory.
+The file is scanned once for line ends outside quoted fields, keeping the
+byte offset and row number of a line start about every SCAN_BYTES. Blank
+lines are not counted as rows, as the parser skips them. A
+column is parsed only when it is first asked for, block by block in the
+csvparse process pool, and parsed columns are kept within a memory budget,
+the least recently used being dropped first. With a column cache parsed
+columns are written there and memory mapped back, so a dropped column is
+reopened instead of parsed again.
+
+License: this code is in the public domain
+"""
+import mmap
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+import csvparse
+import perf
+from catindex import CATEGORY, CategoricalColumn
+
+
+SCAN_BYTES = 8 * 1024 * 1024
+BLANK = np.frombuffer(b'\r\n', np.uint8)
+MEMORY_BUDGET = 1024 ** 3
+
+
+class RowIndex(object):
+    """ Byte offsets and first row numbers of the blocks of a file """
+    def __init__(self, starts, first_rows, rows, size):
+        self.starts = starts
+        self.first_rows = first_rows
+        self.rows = rows
+        self.size = size
+
+    @classmethod
+    def build(cls, filename, skip_lines=1, progress=None):
+        """ Scans filename for row starts. progress(bytes, total) is called
+            after every block and may return False to stop, in which case
+            None is returned.
+        """
+        start = csvparse.header_end(filename, skip_lines)
+        size = os.path.getsize(filename)
+        starts, first_rows = [start], [0]
+        rows = 0
+        inside = 0
+        # Whether the line not yet ended holds anything but line end bytes
+        content = False
+        if start < size:
+            with open(filename, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    pos = start
+                    while pos < size:
+                        stop = min(pos + SCAN_BYTES, size)
+                        buf = np.frombuffer(mm[pos:stop], np.uint8)
+                        ends = np.flatnonzero(buf == ord('\n'))
+                        quotes = buf == ord('"')
+                        if inside or quotes.any():
+                            parity = (np.cumsum(quotes) + inside) % 2
+                            ends = ends[parity[ends] == 0]
+                            inside = int(parity[-1])
+                        filled = np.cumsum(~np.isin(buf, BLANK), dtype=np.int64)
+                        if len(ends):
+                            lines = np.diff(np.concatenate(([0], filled[ends])))
+                            lines[0] += content
+                            rows += int(np.count_nonzero(lines))
+                            starts.append(pos + int(ends[-1]) + 1)
+                            first_rows.append(rows)
+                            content = bool(filled[-1] > filled[ends[-1]])
+                        else:
+                            content = content or bool(filled[-1])
+                        pos = stop
+                        if progress is not None and progress(pos, size) is False:
+                            return None
+                    if content:
+                        rows += 1
+                finally:
+                    mm.close()
+        if starts[-1] >= size and len(starts) > 1:
+            starts.pop()
+            first_rows.pop()
+        return cls(np.array(starts, dtype=np.int64), np.array(first_rows, dtype=np.int64), rows, size)
+
+    def ranges(self):
+        """ (start, end) byte range of every block """
+        if not self.rows:
+            return []
+        ends = list(self.starts[1:]) + [self.size]
+        return [(int(start), int(end)) for start, end in zip(self.starts, ends)]
+
+    def block_rows(self):
+        """ Number of rows in every block """
+        return np.diff(np.append(self.first_rows, self.rows))
+
+
+class LazyTable(object):
+    """ A ColumnTable look-alike whose columns are parsed on first use.
+        columns is the list of (name, format) of every column in the file.
+    """
+    def __init__(self, filename, columns, index, cache=None, budget=MEMORY_BUDGET,
+                 skip_lines=1, processes=None):
+        self.filename = filename
+        self.names = [name for name, fmt in columns]
+        self.formats = dict(columns)
+        self.index = index
+        self.cache = cache
+        self.budget = budget
+        self.skip_lines = skip_lines
+        self.processes = processes
+        self.loaded = OrderedDict()
+        self.stats = {}
+
+    def __len__(self):
+        return self.index.rows
+
+    def __getitem__(self, name):
+        return self.load(name)
+
+    def is_loaded(self, name):
+        return name in self.loaded
+
+    def nbytes(self):
+        return sum(column.nbytes for column in self.loaded.values())
+
+    def load(self, name, progress=None):
+        """ Returns column name, parsing it if it is not loaded. progress is
+            passed on to parse(); if parsing is stopped None is returned.
+        """
+        column = self.loaded.pop(name, None)
+        if column is None:
+            fmt = self.formats[name]
+            category = fmt == CATEGORY
+            dtype = np.dtype(csvparse.FORMATS[fmt])
+            if self.cache is not None:
+                column = self.cache.get_column(self.filename, name, CATEGORY if category else dtype,
+                                               self.skip_lines)
+            if column is None:
+                with perf.stage('parse column'):
+                    column = self.parse(name, dtype, category, progress)
+                if column is None:
+                    return None
+                column = self.cached(name, column, dtype, category)
+        self.loaded[name] = column
+        self.evict(keep=name)
+        return column
+
+    def parse(self, name, dtype, category=False, progress=None):
+        """ Parses column name from every block of the file. progress(blocks
+            done, blocks) may return False to stop, and None is returned.
+        """
+        ranges = self.index.ranges()
+        counts = self.index.block_rows()
+        out = None if category else np.empty(self.index.rows, dtype)
+        pieces = []
+        parser = csvparse.iter_parse_column(self.filename, ranges, self.names.index(name),
+                                            len(self.names), dtype, category, self.processes)
+        try:
+            for i, piece in enumerate(parser):
+                if len(piece) != counts[i]:
+                    raise ValueError("Block %d of column %s has %d rows, expected %d"
+                                     % (i, name, len(piece), counts[i]))
+                if category:
+                    pieces.append(piece)
+                else:
+                    first = self.index.first_rows[i]
+                    out[first:first + len(piece)] = piece
+                if progress is not None and progress(i + 1, len(ranges)) is False:
+                    return None
+        finally:
+            parser.close()
+        if not category:
+            return out
+        if not pieces:
+            return CategoricalColumn.encode(np.zeros(0, dtype))
+        return CategoricalColumn.concat(pieces)
+
+    def cached(self, name, column, dtype, category):
+        """ Writes column to the column cache and returns it memory mapped """
+        if self.cache is None:
+            return column
+        try:
+            self.cache.put_column(self.filename, name, column, self.skip_lines)
+            mapped = self.cache.get_column(self.filename, name, CATEGORY if category else dtype,
+                                           self.skip_lines)
+        except (IOError, OSError):
+            return column
+        return column if mapped is None else mapped
+
+    def evict(self, keep=None):
+        """ Drops the least recently used columns until the loaded ones fit
+            in the budget
+        """
+        for name in list(self.loaded):
+            if self.nbytes() <= self.budget:
+                break
+            if name != keep:
+                del self.loaded[name]
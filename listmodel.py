@@ -0,0 +1,120 @@
+"""
+
+Rows behind the virtual list controls of the data analysis gui.
+Every column is a numpy array over the items. The rows shown are the
+items passing the type-ahead filter, in the chosen sort order, kept as one
+array of item numbers so the control only asks for the rows on screen.
+Selection is kept per item, so it survives filtering and sorting.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+
+def text(value):
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def lowered(column):
+    """ Lower case strings of column for matching the filter against """
+    if column.dtype.kind in 'SU':
+        return np.char.lower(column)
+    return np.array([text(value).lower() for value in column], dtype='U')
+
+
+class ListModel(object):
+    def __init__(self, *columns):
+        self.pattern = ''
+        self.sort_col = None
+        self.descending = False
+        self.set_columns(*columns)
+
+    def set_columns(self, *columns):
+        """ Replaces every item. Filter and sort settings are kept, the
+            selection is cleared.
+        """
+        self.columns = [np.asarray(column) for column in columns]
+        self.selected = np.zeros(self.count(), dtype=bool)
+        self.keys = None
+        self.update()
+
+    def count(self):
+        """ Number of items, shown or not """
+        return len(self.columns[0]) if self.columns else 0
+
+    def __len__(self):
+        """ Number of rows shown """
+        return len(self.order)
+
+    def item(self, row):
+        return int(self.order[row])
+
+    def row_of(self, item):
+        """ Row showing item, or -1 if it is filtered out """
+        rows = np.flatnonzero(self.order == item)
+        return int(rows[0]) if len(rows) else -1
+
+    def value(self, item, col):
+        return self.columns[col][item]
+
+    def text(self, row, col):
+        return text(self.columns[col][self.order[row]])
+
+    def set_value(self, item, col, value):
+        self.columns[col][item] = value
+
+    def append(self, *values):
+        self.columns = [np.concatenate((column, np.array([value], dtype=column.dtype)))
+                        for column, value in zip(self.columns, values)]
+        self.selected = np.append(self.selected, False)
+        self.keys = None
+        self.update()
+
+    def delete(self, item):
+        self.columns = [np.delete(column, item) for column in self.columns]
+        self.selected = np.delete(self.selected, item)
+        self.keys = None
+        self.update()
+
+    def filter(self, pattern):
+        """ Shows only items whose first column contains pattern, ignoring case """
+        self.pattern = pattern
+        self.update()
+
+    def sort(self, col, descending=False):
+        """ Orders the rows by column col, or by item number if col is None """
+        self.sort_col = col
+        self.descending = descending
+        self.update()
+
+    def update(self):
+        n = self.count()
+        if self.sort_col is None:
+            order = np.arange(n)
+        else:
+            order = np.argsort(self.columns[self.sort_col], kind='mergesort')
+        if self.descending:
+            order = order[::-1]
+        if self.pattern:
+            if self.keys is None:
+                self.keys = lowered(self.columns[0])
+            pattern = self.pattern.lower()
+            if self.keys.dtype.kind == 'S':
+                pattern = pattern.encode('utf-8')
+            order = order[np.char.find(self.keys[order], pattern) >= 0]
+        self.order = order
+
+    def set_selected_rows(self, rows):
+        """ Sets the selection of the rows shown to exactly rows. Items
+            that are filtered out keep their state.
+        """
+        self.selected[self.order] = False
+        self.selected[self.order[np.asarray(rows, dtype=int)]] = True
+
+    def selected_rows(self):
+        return np.flatnonzero(self.selected[self.order])
+
+    def selected_items(self):
+        return np.flatnonzero(self.selected)
@@ -0,0 +1,175 @@
+"""
+
+Level of detail decimation for plotting long series.
+A Pyramid keeps the min and max of a column over blocks of FACTOR**k rows,
+so the visible part of a series can be reduced to one min/max pair per
+pixel column in time proportional to the number of pixels, whatever the
+number of rows. Peaks and single sample glitches stay visible. A pyramid
+can be extended in place when rows are appended to its column.
+
+License: this code is in the public domain
+"""
+import numpy as np
+
+
+FACTOR = 4
+MIN_LEVEL = 1024
+
+
+def is_monotonic(x):
+    return len(x) < 2 or bool(np.all(x[1:] >= x[:-1]))
+
+
+def can_decimate(y):
+    return y.dtype.kind in 'iuf'
+
+
+def _store(buf, start, values):
+    """ Writes values into buf at start, growing buf by doubling """
+    stop = start + len(values)
+    if stop > len(buf):
+        grown = np.empty(max(2 * len(buf), stop), dtype=buf.dtype)
+        grown[:start] = buf[:start]
+        buf = grown
+    buf[start:stop] = values
+    return buf
+
+
+def _first_equal(values, reduced, starts):
+    """ Index in values of the first element of each segment (from starts)
+        equal to that segment's reduced value; the segment start if none is
+        (all NaN)
+    """
+    n = len(values)
+    lengths = np.diff(np.append(starts, n))
+    index = np.where(values == np.repeat(reduced, lengths), np.arange(n), n)
+    first = np.minimum.reduceat(index, starts)
+    return np.where(first < n, first, starts)
+
+
+class Pyramid(object):
+    """ Levels of [mins, maxs, length, min rows, max rows], level k over
+        blocks of FACTOR**(k+1) rows, the rows being those of y where the
+        block minimum and maximum are
+    """
+    def __init__(self, y):
+        self.y = y[:0]
+        self.levels = []
+        self.update(y)
+
+    def update(self, y):
+        """ Extends the pyramid to y, which must start with the rows the
+            pyramid was built for. Only the blocks covering new rows are
+            recomputed.
+        """
+        changed = len(self.y)
+        self.y = y
+        mins = maxs = y
+        min_rows = max_rows = None
+        n = len(y)
+        k = 0
+        while n > MIN_LEVEL:
+            first = changed // FACTOR if k < len(self.levels) else 0
+            lo = first * FACTOR
+            starts = np.arange(0, n - lo, FACTOR)
+            block_mins = np.asarray(mins[lo:n], dtype=float)
+            block_maxs = np.asarray(maxs[lo:n], dtype=float)
+            new_mins = np.fmin.reduceat(block_mins, starts)
+            new_maxs = np.fmax.reduceat(block_maxs, starts)
+            new_min_rows = lo + _first_equal(block_mins, new_mins, starts)
+            new_max_rows = lo + _first_equal(block_maxs, new_maxs, starts)
+            if min_rows is not None:
+                new_min_rows = min_rows[new_min_rows]
+                new_max_rows = max_rows[new_max_rows]
+            if k == len(self.levels):
+                self.levels.append([np.empty(0), np.empty(0), 0,
+                                    np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)])
+            level = self.levels[k]
+            level[0] = _store(level[0], first, new_mins)
+            level[1] = _store(level[1], first, new_maxs)
+            level[3] = _store(level[3], first, new_min_rows)
+            level[4] = _store(level[4], first, new_max_rows)
+            level[2] = n = first + len(new_mins)
+            mins, maxs, min_rows, max_rows = level[0], level[1], level[3], level[4]
+            changed = first
+            k += 1
+
+    def minmax(self, lo, hi, buckets):
+        """ Returns (rows, values): two points per bucket over rows lo:hi,
+            the bucket minimum and maximum at their own rows, in row order
+            so the line does not go back and forth
+        """
+        n = hi - lo
+        block = 1
+        mins = maxs = self.y
+        min_rows = max_rows = None
+        for level_mins, level_maxs, length, level_min_rows, level_max_rows in self.levels:
+            if block * FACTOR > n // buckets:
+                break
+            block *= FACTOR
+            mins, maxs = level_mins[:length], level_maxs[:length]
+            min_rows, max_rows = level_min_rows[:length], level_max_rows[:length]
+        blo = lo // block
+        bhi = -(-hi // block)
+        edges = np.unique(np.linspace(blo, bhi, buckets + 1).astype(int))[:-1]
+        starts = edges - blo
+        block_mins = np.asarray(mins[blo:bhi], dtype=float)
+        block_maxs = np.asarray(maxs[blo:bhi], dtype=float)
+        mn = np.fmin.reduceat(block_mins, starts)
+        mx = np.fmax.reduceat(block_maxs, starts)
+        at_min = blo + _first_equal(block_mins, mn, starts)
+        at_max = blo + _first_equal(block_maxs, mx, starts)
+        if min_rows is not None:
+            at_min = min_rows[at_min]
+            at_max = max_rows[at_max]
+            # The blocks at the ends of the view can reach outside lo:hi, so
+            # the end buckets are reduced again without the rows outside
+            bounds = np.append(edges * block, hi)
+            bounds[0] = lo
+            for i in {0, len(edges) - 1}:
+                mn[i], at_min[i], mx[i], at_max[i] = self.extremes(
+                    bounds[i], bounds[i + 1], block, mins, maxs, min_rows, max_rows)
+        max_first = at_max < at_min
+        rows = np.empty(2 * len(edges), dtype=int)
+        rows[0::2] = np.where(max_first, at_max, at_min)
+        rows[1::2] = np.where(max_first, at_min, at_max)
+        values = np.empty(2 * len(edges))
+        values[0::2] = np.where(max_first, mx, mn)
+        values[1::2] = np.where(max_first, mn, mx)
+        return rows, values
+
+    def extremes(self, lo, hi, block, mins, maxs, min_rows, max_rows):
+        """ (min, its row, max, its row) of y[lo:hi] from the blocks of a
+            level that lie inside lo:hi and the rows of y around them
+        """
+        inner_lo = min(-(-lo // block), hi // block)
+        inner_hi = max(hi // block, inner_lo)
+        raw = np.r_[lo:inner_lo * block, max(inner_hi * block, lo):hi]
+        raw_values = np.asarray(self.y[raw], dtype=float)
+        out = []
+        for level, level_rows, reduce in ((mins, min_rows, np.fmin), (maxs, max_rows, np.fmax)):
+            values = np.concatenate((raw_values, level[inner_lo:inner_hi]))
+            rows = np.concatenate((raw, level_rows[inner_lo:inner_hi]))
+            value = reduce.reduce(values)
+            hit = rows[values == value]
+            out += [value, hit.min() if len(hit) else lo]
+        return tuple(out)
+
+
+def view_rows(x, xmin, xmax):
+    """ Row range of monotonic x covering [xmin, xmax] plus one row each side """
+    lo = max(int(np.searchsorted(x, xmin, 'left')) - 1, 0)
+    hi = min(int(np.searchsorted(x, xmax, 'right')) + 1, len(x))
+    return lo, hi
+
+
+def decimate(x, pyramid, xmin, xmax, buckets):
+    """ Returns the (x, y) to plot for the view [xmin, xmax] at about
+        buckets pixel columns. x must be monotonic.
+    """
+    y = pyramid.y
+    lo, hi = view_rows(x, xmin, xmax)
+    if hi - lo <= 2 * buckets:
+        return x[lo:hi], y[lo:hi]
+    rows, values = pyramid.minmax(lo, hi, buckets)
+    return x[rows], values
@@ -0,0 +1,130 @@
+"""
+
+Hot path instrumentation for the data analysis gui.
+Code paths are wrapped in `with perf.stage('name'):`. While the recorder
+is disabled this returns a shared no-op context manager, so the cost is
+one attribute check. When enabled every stage records its wall time and
+the change in resident memory, keeps per-stage totals and can be written
+out as a Chrome trace (chrome://tracing, Perfetto).
+
+License: this code is in the public domain
+"""
+import json
+import os
+import threading
+import time
+
+
+clock = getattr(time, 'perf_counter', time.time)
+MAX_EVENTS = 200000
+
+
+def rss_mb():
+    """ Current resident set size in MB, or the peak where that is all
+        the platform offers
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+class _NullStage(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage(object):
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.rss = rss_mb()
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        end = clock()
+        self.recorder.record(self.name, self.start, end, rss_mb() - self.rss)
+        return False
+
+
+class Recorder(object):
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.origin = clock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.events = []
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def record(self, name, start, end, rss_delta):
+        seconds = end - start
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+            stat['count'] += 1
+            stat['total'] += seconds
+            stat['max'] = max(stat['max'], seconds)
+            stat['last'] = seconds
+            stat['rss_delta'] = rss_delta
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((name, start, seconds, threading.current_thread().ident, rss_delta))
+
+    def last(self, name):
+        """ Seconds taken the last time stage name ran, 0 if it never did,
+            as when recording was turned on while it was running
+        """
+        with self.lock:
+            stat = self.stats.get(name)
+            return stat['last'] if stat else 0.0
+
+    def summary(self):
+        """ (name, count, total s, mean s, max s, last s, last rss delta MB)
+            per stage, largest total first
+        """
+        with self.lock:
+            rows = [(name, s['count'], s['total'], s['total'] / s['count'], s['max'],
+                     s['last'], s['rss_delta']) for name, s in self.stats.items()]
+        return sorted(rows, key=lambda row: -row[2])
+
+    def dump_trace(self, filename):
+        """ Writes the recorded stages as Chrome trace event JSON """
+        pid = os.getpid()
+        with self.lock:
+            events = [{'name': name, 'cat': 'capture', 'ph': 'X', 'pid': pid, 'tid': tid,
+                       'ts': 1e6 * (start - self.origin), 'dur': 1e6 * seconds,
+                       'args': {'rss_delta_mb': round(rss_delta, 3)}}
+                      for name, start, seconds, tid, rss_delta in self.events]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
+
+recorder = Recorder()
+
+
+def stage(name):
+    return recorder.stage(name)
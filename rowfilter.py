@@ -0,0 +1,240 @@
+"""
+
+Row filter expressions for the data analysis gui.
+An expression such as  temp > 50 and status == 'OK'  is parsed with the
+ast module, checked against a small whitelist of operations and compiled
+to a tree of numpy operations over the columns it names. It is evaluated
+in chunks of CHUNK_ROWS rows, so temporaries stay small whatever the
+number of rows. A Category column compared with strings is compared on its
+codes, without decoding. Columns whose names are not identifiers are
+written col('name').
+
+License: this code is in the public domain
+"""
+import ast
+import operator
+from functools import reduce
+
+import numpy as np
+
+from catindex import CategoricalColumn
+
+
+CHUNK_ROWS = 256 * 1024
+
+COMPARE = {ast.Eq: operator.eq, ast.NotEq: operator.ne,
+           ast.Lt: operator.lt, ast.LtE: operator.le,
+           ast.Gt: operator.gt, ast.GtE: operator.ge}
+FLIPPED = {operator.lt: operator.gt, operator.le: operator.ge,
+           operator.gt: operator.lt, operator.ge: operator.le,
+           operator.eq: operator.eq, operator.ne: operator.ne}
+BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+          ast.Div: operator.truediv, ast.Mod: operator.mod}
+FUNCTIONS = {'abs': np.abs, 'isnan': np.isnan}
+CONSTANTS = {'True': True, 'False': False, 'nan': np.nan}
+
+
+class FilterError(ValueError):
+    pass
+
+
+class Node(object):
+    column = None
+    const = None
+    is_const = False
+
+
+class Const(Node):
+    is_const = True
+
+    def __init__(self, value):
+        self.const = value
+
+    def __call__(self, data, lo, hi):
+        return self.const
+
+
+class Column(Node):
+    def __init__(self, name):
+        self.column = name
+
+    def __call__(self, data, lo, hi):
+        return np.asarray(data[self.column][lo:hi])
+
+
+class Apply(Node):
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __call__(self, data, lo, hi):
+        return self.func(*[arg(data, lo, hi) for arg in self.args])
+
+
+def _like(value, values):
+    """ value as bytes if compared with a bytes array """
+    if isinstance(value, str) and getattr(values, 'dtype', None) is not None and values.dtype.kind == 'S':
+        return value.encode('utf-8')
+    return value
+
+
+def _category_compare(column, op, value, lo, hi):
+    """ op(column[lo:hi], value) on the codes of a CategoricalColumn, or
+        on their ranks if its vocabulary is not sorted
+    """
+    categories = column.categories
+    codes = column.codes[lo:hi]
+    if column.sorter is not None:
+        codes = column.ranks()[codes]
+    value = _like(value, categories)
+    left = int(np.searchsorted(categories, value, 'left', column.sorter))
+    right = int(np.searchsorted(categories, value, 'right', column.sorter))
+    if op is operator.eq:
+        return codes == left if right > left else np.zeros(len(codes), dtype=bool)
+    if op is operator.ne:
+        return codes != left if right > left else np.ones(len(codes), dtype=bool)
+    if op is operator.lt:
+        return codes < left
+    if op is operator.le:
+        return codes < right
+    if op is operator.gt:
+        return codes >= right
+    return codes >= left
+
+
+class Compare(Node):
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __call__(self, data, lo, hi):
+        for node, other, op in ((self.left, self.right, self.op),
+                                (self.right, self.left, FLIPPED[self.op])):
+            if node.column is not None and other.is_const and isinstance(other.const, (str, bytes)):
+                column = data[node.column]
+                if isinstance(column, CategoricalColumn):
+                    return _category_compare(column, op, other.const, lo, hi)
+        a = self.left(data, lo, hi)
+        b = self.right(data, lo, hi)
+        return self.op(_like(a, b), _like(b, a))
+
+
+class IsIn(Node):
+    def __init__(self, column, values, negate):
+        self.column_node = column
+        self.values = values
+        self.negate = negate
+
+    def __call__(self, data, lo, hi):
+        name = self.column_node.column
+        if name is not None and isinstance(data[name], CategoricalColumn):
+            column = data[name]
+            values = np.array([_like(value, column.categories) for value in self.values])
+            codes = np.flatnonzero(np.isin(column.categories, values))
+            return np.isin(column.codes[lo:hi], codes, invert=self.negate)
+        a = self.column_node(data, lo, hi)
+        return np.isin(a, [_like(value, a) for value in self.values], invert=self.negate)
+
+
+def _constant(node):
+    """ (True, value) if node is a literal, else (False, None) """
+    if hasattr(ast, 'Constant') and isinstance(node, ast.Constant):
+        return True, node.value
+    if isinstance(node, getattr(ast, 'Num', ())):
+        return True, node.n
+    if isinstance(node, getattr(ast, 'Str', ())):
+        return True, node.s
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        ok, value = _constant(node.operand)
+        if ok and isinstance(value, (int, float)):
+            return True, -value
+    return False, None
+
+
+class RowFilter(object):
+    """ A compiled filter expression over the columns in names. key is the
+        same for expressions that differ only in spacing.
+    """
+    def __init__(self, text, names):
+        self.text = text
+        self.names = set(names)
+        self.columns = set()
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+        except SyntaxError as e:
+            raise FilterError("Syntax error in filter: %s" % e.msg)
+        self.key = ast.dump(tree)
+        self.root = self.compile(tree.body)
+
+    def column(self, name):
+        if name not in self.names:
+            raise FilterError("Unknown column %s" % name)
+        self.columns.add(name)
+        return Column(name)
+
+    def compile(self, node):
+        ok, value = _constant(node)
+        if ok:
+            return Const(value)
+        if isinstance(node, ast.Name):
+            if node.id in self.names:
+                return self.column(node.id)
+            if node.id in CONSTANTS:
+                return Const(CONSTANTS[node.id])
+            return self.column(node.id)
+        if isinstance(node, ast.BoolOp):
+            func = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            parts = [self.compile(value) for value in node.values]
+            return Apply(lambda *values: reduce(func, values), *parts)
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return Apply(np.logical_not, self.compile(node.operand))
+            if isinstance(node.op, ast.USub):
+                return Apply(operator.neg, self.compile(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY:
+            return Apply(BINARY[type(node.op)], self.compile(node.left), self.compile(node.right))
+        if isinstance(node, ast.Compare):
+            parts = []
+            left = node.left
+            for op, right in zip(node.ops, node.comparators):
+                parts.append(self.compare(left, op, right))
+                left = right
+            if len(parts) == 1:
+                return parts[0]
+            return Apply(lambda *values: reduce(np.logical_and, values), *parts)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            if node.func.id == 'col' and len(node.args) == 1:
+                ok, name = _constant(node.args[0])
+                if ok and isinstance(name, str):
+                    return self.column(name)
+            if node.func.id in FUNCTIONS and len(node.args) == 1:
+                return Apply(FUNCTIONS[node.func.id], self.compile(node.args[0]))
+        raise FilterError("Not allowed in a filter: %s" % type(node).__name__)
+
+    def compare(self, left, op, right):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(right, (ast.Tuple, ast.List)):
+                raise FilterError("'in' needs a list of values")
+            values = []
+            for item in right.elts:
+                ok, value = _constant(item)
+                if not ok:
+                    raise FilterError("'in' needs a list of values")
+                values.append(value)
+            return IsIn(self.compile(left), values, isinstance(op, ast.NotIn))
+        if type(op) not in COMPARE:
+            raise FilterError("Not allowed in a filter: %s" % type(op).__name__)
+        return Compare(COMPARE[type(op)], self.compile(left), self.compile(right))
+
+    def evaluate(self, data, start=0):
+        """ Boolean mask of the rows of data from start on that pass """
+        n = len(data)
+        mask = np.empty(max(n - start, 0), dtype=bool)
+        for lo in range(start, n, CHUNK_ROWS):
+            hi = min(lo + CHUNK_ROWS, n)
+            result = np.asarray(self.root(data, lo, hi))
+            if result.dtype.kind != 'b':
+                raise FilterError("Filter is not a condition: %s" % self.text)
+            mask[lo - start:hi - start] = result
+        return mask
@@ -0,0 +1,32 @@
+"""
+
+Column table for the data analysis gui.
+Holds named, equal length columns that may be plain arrays or memory maps,
+and supports the part of the structured array interface GraphFrame uses:
+data[name] and len(data). stats holds the colstats.ColumnStats of columns
+that have been computed.
+
+License: this code is in the public domain
+"""
+
+
+class ColumnTable(object):
+    def __init__(self, names, columns):
+        self.names = list(names)
+        self.columns = dict(zip(self.names, columns))
+        self.stats = {}
+
+    @classmethod
+    def from_records(cls, records):
+        return cls(records.dtype.names, [records[name] for name in records.dtype.names])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        if not self.names:
+            return 0
+        return len(self.columns[self.names[0]])
+
+    def nbytes(self):
+        return sum(self.columns[name].nbytes for name in self.names)
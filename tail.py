@@ -0,0 +1,187 @@
+"""
+
+Follow mode for csv files that are still being written.
+FileFollower parses only the complete lines appended since the last poll
+and appends them to column buffers. Buffers grow by doubling, or with a
+rolling window keep only the last rows in a ring, so appending costs the
+same whatever the amount of data already held.
+
+License: this code is in the public domain
+"""
+import os
+
+import numpy as np
+
+import compressed
+import csvparse
+from catindex import CategoricalColumn
+from table import ColumnTable
+
+
+POLL_BYTES = 4 * 1024 * 1024
+
+
+class ColumnBuffer(object):
+    """ Appendable column. With a window only the last window rows are
+        kept; the storage is twice the window so view() stays contiguous
+        and rows are moved to the front once per window appended rows.
+    """
+    def __init__(self, dtype, window=None, capacity=1024):
+        self.window = window
+        self.buf = np.empty(2 * window if window else capacity, dtype)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def view(self):
+        return self.buf[self.start:self.end]
+
+    def extend(self, values):
+        m = len(values)
+        if self.window is None:
+            if self.end + m > len(self.buf):
+                buf = np.empty(max(2 * len(self.buf), self.end + m), self.buf.dtype)
+                buf[:self.end] = self.buf[:self.end]
+                self.buf = buf
+        else:
+            if m >= self.window:
+                self.buf[:self.window] = values[m - self.window:]
+                self.start, self.end = 0, self.window
+                return
+            if self.end + m > len(self.buf):
+                keep = min(self.end - self.start, self.window - m)
+                self.buf[:keep] = self.buf[self.end - keep:self.end]
+                self.start, self.end = 0, keep
+        self.buf[self.end:self.end + m] = values
+        self.end += m
+        if self.window is not None:
+            self.start = max(self.start, self.end - self.window)
+
+
+class CategoryBuffer(object):
+    """ Appendable dictionary encoded column. New values are appended to
+        the vocabulary, with the permutation that sorts it kept alongside,
+        so the codes held never change as values arrive. With a window the
+        values no longer held are dropped from the vocabulary once per
+        window rows appended, which renumbers the codes; renumbered then
+        maps old codes to new ones (-1 when dropped) until the next extend.
+        Codes are held as uint32, so view() copies nothing.
+    """
+    def __init__(self, dtype, window=None):
+        self.dtype = dtype
+        self.window = window
+        self.categories = ColumnBuffer(dtype)
+        self.sorter = np.empty(0, dtype=np.int64)
+        self.codes = ColumnBuffer(np.uint32, window)
+        self.appended = 0
+        self.renumbered = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def extend(self, column):
+        self.renumbered = None
+        if not isinstance(column, CategoricalColumn):
+            column = CategoricalColumn.encode(column)
+        values = np.asarray(column.categories).astype(self.dtype)
+        known = self.categories.view()
+        at = np.searchsorted(known, values, sorter=self.sorter)
+        codes = self.sorter[np.minimum(at, len(known) - 1)] if len(known) else at
+        found = at < len(known)
+        found[found] = known[codes[found]] == values[found]
+        remap = np.empty(len(values), dtype=np.uint32)
+        remap[found] = codes[found]
+        if not found.all():
+            new = values[~found]
+            remap[~found] = np.arange(len(known), len(known) + len(new))
+            self.categories.extend(new)
+            order = np.argsort(new, kind='mergesort')
+            self.sorter = np.insert(self.sorter, at[~found][order], len(known) + order)
+        self.codes.extend(remap[column.codes])
+        if self.window is not None:
+            self.appended += len(column.codes)
+            if self.appended >= self.window:
+                self.prune()
+
+    def prune(self):
+        """ Drops the values no longer held from the vocabulary """
+        self.appended = 0
+        held = self.codes.view()
+        used = np.bincount(held, minlength=len(self.categories)) > 0
+        if used.all():
+            return
+        renumbered = np.cumsum(used) - 1
+        renumbered[~used] = -1
+        held[:] = renumbered[held]
+        categories = ColumnBuffer(self.dtype)
+        categories.extend(self.categories.view()[used])
+        self.categories = categories
+        self.sorter = renumbered[self.sorter[used[self.sorter]]]
+        self.renumbered = renumbered
+
+    def view(self):
+        return CategoricalColumn(self.categories.view(), self.codes.view(), self.sorter)
+
+
+class FileFollower(object):
+    def __init__(self, filename, dt, offset, categories=(), window=None, table=None):
+        self.filename = filename
+        self.dt = dt
+        self.categories = categories
+        self.window = window
+        self.offset = offset
+        self.reset()
+        if table is not None and len(table):
+            self.append([table[name] for name in dt.names])
+
+    def reset(self):
+        self.buffers = []
+        for name in self.dt.names:
+            if name in self.categories:
+                self.buffers.append(CategoryBuffer(self.dt[name], self.window))
+            else:
+                self.buffers.append(ColumnBuffer(self.dt[name], self.window))
+
+    def append(self, columns):
+        for buf, column in zip(self.buffers, columns):
+            buf.extend(column)
+
+    def poll(self, max_bytes=POLL_BYTES):
+        """ Parses complete rows appended since the last poll, a row ending
+            at a newline outside quotes. Returns the number of rows added,
+            or -1 if the file was truncated and is being reread from the
+            start. Rows that do not parse raise ValueError and are not
+            consumed.
+        """
+        size = os.path.getsize(self.filename)
+        truncated = size < self.offset
+        if truncated:
+            self.offset = csvparse.header_end(self.filename)
+            self.reset()
+        if size == self.offset:
+            return -1 if truncated else 0
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(min(size - self.offset, max_bytes))
+        end = compressed.row_end(data)
+        if end == 0:
+            return -1 if truncated else 0
+        columns = csvparse.parse_text(data[:end].decode('utf-8', 'replace'), self.dt)
+        self.offset += end
+        self.append(columns)
+        return -1 if truncated else len(columns[0])
+
+    def renumbered(self):
+        """ {name: old code to new code, -1 if dropped} of the Category
+            columns whose vocabulary was pruned by the last poll
+        """
+        return dict((name, buf.renumbered) for name, buf in zip(self.dt.names, self.buffers)
+                    if getattr(buf, 'renumbered', None) is not None)
+
+    def __len__(self):
+        return len(self.buffers[0]) if self.buffers else 0
+
+    def table(self):
+        return ColumnTable(self.dt.names, [buf.view() for buf in self.buffers])
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from catindex import CategoricalColumn, CategoricalIndex
+from tail import CategoryBuffer
+
+
+def check_index(index, values):
+    """ index holds the rows of every value of values """
+    for code in range(len(index)):
+        assert np.array_equal(index.rows(code), np.flatnonzero(values == index.categories[code]))
+    assert index.counts.sum() == len(values)
+
+
+@pytest.mark.parametrize('encode', [False, True])
+def test_extended_index_matches_rebuild(encode):
+    rng = np.random.default_rng(1)
+    values = rng.choice(np.array([b'a', b'b', b'c', b'd', b'e']), 300)
+    index = CategoricalIndex.from_values(values[:40])
+    for n in (100, 150, 151, 300):
+        index = index.extended(CategoricalColumn.encode(values[:n]) if encode else values[:n])
+        check_index(index, values[:n])
+        codes = [index.code_of(b'e'), index.code_of(b'a')]
+        rows, lengths = index.group_rows(codes)
+        assert np.array_equal(rows, np.concatenate([index.rows(code) for code in codes]))
+        assert np.array_equal(index.take(codes), np.sort(rows))
+
+
+def test_extended_index_of_appended_vocabulary():
+    rng = np.random.default_rng(2)
+    values = np.array([b'id%03d' % i for i in range(200)])[rng.integers(0, 200, 5000)]
+    buf = CategoryBuffer('S10')
+    index = None
+    for lo in range(0, 5000, 250):
+        buf.extend(values[lo:lo + 250])
+        column = buf.view()
+        index = column.index() if index is None else index.extended(column)
+    check_index(index, values)
+    assert len(index.runs) < 8
+    for value in (b'id000', b'id150', b'id199', b'zz'):
+        code = index.code_of(value)
+        assert code == -1 if value == b'zz' else index.categories[code] == value
+    assert list(index.categories[index.sorted_codes()]) == sorted(index.categories)
+
+
+def test_sorted_copy():
+    column = CategoricalColumn(np.array([b'z', b'a', b'm']), np.array([0, 1, 2, 0]), np.array([1, 2, 0]))
+    copy = column.sorted()
+    assert list(copy.categories) == [b'a', b'm', b'z']
+    assert list(np.asarray(copy)) == list(np.asarray(column)) == [b'z', b'a', b'm', b'z']
+
+
+def test_index_rows():
+    index = CategoricalIndex.from_values(np.array([b'b', b'a', b'b', b'c', b'a']))
+    assert list(index.rows(index.code_of(b'a'))) == [1, 4]
+    assert list(index.take([index.code_of(b'b'), index.code_of(b'c')])) == [0, 2, 3]
+    rows, lengths = index.group_rows([index.code_of(b'c'), index.code_of(b'b')])
+    assert list(rows) == [3, 0, 2] and list(lengths) == [1, 2]
+    assert index.code_of(b'x') == -1
+    assert index.label(index.code_of(b'c')) == 'c'
+
+
+def test_take_many_codes_scans_the_column():
+    values = np.arange(100) % 3
+    index = CategoricalIndex.from_values(values)
+    assert np.array_equal(index.take([0, 2]), np.flatnonzero(values != 1))
+
+
+def test_encode_and_concat():
+    left = CategoricalColumn.encode(np.array([b'm', b'a', b'm']))
+    right = CategoricalColumn.encode(np.array([b'z', b'a']))
+    assert left.codes.dtype == np.uint8
+    column = CategoricalColumn.concat([left, right])
+    assert list(column.categories) == [b'a', b'm', b'z']
+    assert list(np.asarray(column)) == [b'm', b'a', b'm', b'z', b'a']
+    assert column[3] == b'z'
+    many = CategoricalColumn.encode(np.repeat(np.array([b'long value one', b'long value two']), 100))
+    assert many.nbytes < np.asarray(many).nbytes
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+import colcache
+import csvparse
+from catindex import CATEGORY, CategoricalColumn
+from table import ColumnTable
+
+
+def source(tmp_path, name='data.csv', text='a,k\n1,x\n2,y\n'):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+def table():
+    return ColumnTable(['a', 'k'], [np.array([1, 2]), CategoricalColumn.encode(np.array([b'x', b'y']))])
+
+
+def test_put_and_get(tmp_path):
+    cache = colcache.ColumnCache(str(tmp_path / 'cache'))
+    path = source(tmp_path)
+    stored = cache.put(path, table())
+    assert isinstance(stored['a'], np.memmap)
+    dt, categories = csvparse.make_dtype([('a', 'Int'), ('k', 'Category')])
+    data = cache.get(path, dt, categories=categories)
+    assert list(data['a']) == [1, 2]
+    assert list(np.asarray(data['k'])) == [b'x', b'y']
+    assert cache.get_column(path, 'a', np.dtype(float)) is None
+
+
+def test_changed_source_misses(tmp_path):
+    cache = colcache.ColumnCache(str(tmp_path / 'cache'))
+    path = source(tmp_path)
+    cache.put(path, table())
+    with open(path, 'a') as f:
+        f.write('3,z\n')
+    assert cache.get_column(path, 'a', np.dtype(int)) is None
+    assert cache.get_column(path, 'k', CATEGORY) is None
+
+
+def test_put_again_overwrites(tmp_path):
+    cache = colcache.ColumnCache(str(tmp_path / 'cache'))
+    path = source(tmp_path)
+    cache.put_column(path, 'a', np.array([1, 2]))
+    cache.put_column(path, 'a', np.array([3, 4]))
+    assert list(cache.get_column(path, 'a', np.dtype(int))) == [3, 4]
+    entry = cache.entry(path)
+    assert not [f for f in os.listdir(entry) if f.endswith('.tmp')]
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = colcache.ColumnCache(str(tmp_path / 'cache'), max_bytes=1200)
+    old = source(tmp_path, 'old.csv')
+    new = source(tmp_path, 'new.csv')
+    column = ColumnTable(['a'], [np.zeros(100)])
+    cache.put(old, column)
+    os.utime(cache.entry(old), (1, 1))
+    cache.put(new, column)
+    assert cache.get_column(old, 'a', np.dtype(float)) is None
+    assert cache.get_column(new, 'a', np.dtype(float)) is not None
+
+
+def test_replace_without_os_replace(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, 'replace')
+    target = tmp_path / 'target'
+    target.write_text('old')
+    tmp = tmp_path / 'tmp'
+    tmp.write_text('new')
+    colcache._replace(str(tmp), str(target))
+    assert target.read_text() == 'new'
+    assert not tmp.exists()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import colstats
+from catindex import CategoricalColumn
+from table import ColumnTable
+
+
+@pytest.fixture
+def small_zones(monkeypatch):
+    monkeypatch.setattr(colstats, 'ZONE_ROWS', 10)
+    monkeypatch.setattr(colstats, 'CHUNK_ZONES', 3)
+
+
+def test_stats(small_zones):
+    values = np.array([3., np.nan, -1., 7.] * 20)
+    stats = colstats.ColumnStats.of(values)
+    assert (stats.min, stats.max, stats.nan_count, stats.rows) == (-1., 7., 20, 80)
+    assert not stats.sorted
+    assert len(stats.zone_min) == 8
+    assert colstats.ColumnStats.of(np.arange(50)).sorted
+
+
+def test_update_matches_rebuild(small_zones):
+    values = np.random.default_rng(5).standard_normal(237)
+    values[::31] = np.nan
+    stats = colstats.ColumnStats.of(values[:55])
+    stats.update(values[:56])
+    stats.update(values)
+    rebuilt = colstats.ColumnStats.of(values)
+    for name in ('rows', 'min', 'max', 'nan_count', 'sorted'):
+        assert getattr(stats, name) == getattr(rebuilt, name)
+    assert np.array_equal(stats.zone_min, rebuilt.zone_min, equal_nan=True)
+    assert np.array_equal(stats.zone_max, rebuilt.zone_max, equal_nan=True)
+
+
+def test_sorted_across_updates(small_zones):
+    stats = colstats.ColumnStats.of(np.arange(25.))
+    stats.update(np.append(np.arange(25.), [30., 31.]))
+    assert stats.sorted
+    stats.update(np.append(np.arange(25.), [30., 31., 2.]))
+    assert not stats.sorted
+
+
+def test_zone_rows(small_zones):
+    x = np.arange(100.)
+    stats = colstats.ColumnStats.of(x)
+    assert stats.zone_rows(-5, 200) == slice(None)
+    assert stats.zone_rows(200, 300) == slice(0, 0)
+    assert stats.zone_rows(25, 42) == slice(20, 50)
+    y = np.concatenate((np.arange(50.), np.arange(50.)))
+    rows = colstats.ColumnStats.of(y).zone_rows(12, 15)
+    assert list(rows) == list(range(10, 20)) + list(range(60, 70))
+    inside = (y >= 12) & (y <= 15)
+    assert set(np.flatnonzero(inside)) <= set(rows)
+
+
+def test_table_stats():
+    data = ColumnTable(['x', 'k'], [np.arange(5), CategoricalColumn.encode(np.array([b'a'] * 5))])
+    colstats.table_stats(data)
+    assert list(data.stats) == ['x'] and data.stats['x'].max == 4
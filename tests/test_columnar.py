@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+import columnar
+from catindex import CategoricalColumn
+from table import ColumnTable
+
+
+def table():
+    return ColumnTable(['t', 'n', 'ok', 'name', 'k'], [
+        np.array([0.5, 1.5, 2.5]),
+        np.array([1, 2, 3]),
+        np.array([True, False, True]),
+        np.array([b'x', b'y', b'z']),
+        CategoricalColumn.encode(np.array([b'm', b'a', b'm']))])
+
+
+@pytest.mark.parametrize('name', ['data.npz', 'data.columns'])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    columnar.export_table(table(), path)
+    assert columnar.is_columnar(path)
+    data = columnar.open_table(path)
+    assert data.names == ['t', 'n', 'ok', 'name', 'k']
+    for column in data.names:
+        assert columnar.column_format(data[column]) == columnar.column_format(table()[column])
+        assert np.array_equal(np.asarray(data[column]), np.asarray(table()[column]))
+
+
+def test_unsorted_categories_are_sorted_on_read(tmp_path):
+    path = str(tmp_path / 'data.npz')
+    column = CategoricalColumn(np.array([b'z', b'a']), np.array([0, 1, 0], dtype=np.uint8))
+    columnar.export_table(ColumnTable(['k'], [column]), path)
+    k = columnar.open_table(path)['k']
+    assert list(k.categories) == [b'a', b'z']
+    assert list(np.asarray(k)) == [b'z', b'a', b'z']
+
+
+def test_plain_npz(tmp_path):
+    path = str(tmp_path / 'plain.npz')
+    np.savez(path, x=np.arange(3.), s=np.array(['a', 'b', 'c']))
+    data = columnar.open_table(path)
+    assert sorted(data.names) == ['s', 'x']
+    assert list(data['s']) == [b'a', b'b', b'c']
+
+
+def test_not_columnar(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a\n1\n')
+    assert not columnar.is_columnar(str(path))
+    with pytest.raises(ValueError):
+        columnar.export_table(table(), str(tmp_path / 'data.txt'))
+
+
+def test_pyarrow_is_imported_on_first_use():
+    import subprocess
+    import sys
+    code = 'import sys, columnar; print("pyarrow" in sys.modules)'
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(columnar.__file__))
+    assert out.strip() == b'False'
+
+
+def test_parquet_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, '_pyarrow', lambda: None)
+    with pytest.raises(IOError):
+        columnar.open_table(str(tmp_path / 'data.parquet'))
+    with pytest.raises(IOError):
+        columnar.export_table(table(), str(tmp_path / 'data.parquet'))
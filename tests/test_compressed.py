@@ -0,0 +1,74 @@
+import bz2
+import gzip
+
+import numpy as np
+import pytest
+
+import compressed
+import csvparse
+
+
+ROWS = b''.join(b'%d,"text %d\nwith, comma"\n' % (i, i) for i in range(500))
+DATA = b'a,s\n' + ROWS
+
+
+def write(tmp_path, name, data=DATA):
+    path = tmp_path / name
+    if name.endswith('.gz'):
+        data = gzip.compress(data)
+    elif name.endswith('.bz2'):
+        data = bz2.compress(data)
+    elif name.endswith('.xz'):
+        lzma = pytest.importorskip('lzma')
+        data = lzma.compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_row_end():
+    assert compressed.row_end(b'1,2\n3,4\n5,') == 8
+    assert compressed.row_end(b'1,"a\nb"\n2,"c\n') == 8
+    assert compressed.row_end(b'1,"a\n') == 0
+    assert compressed.row_end(b'no newline') == 0
+
+
+@pytest.mark.parametrize('name', ['data.csv.gz', 'data.csv.bz2', 'data.csv.xz'])
+def test_blocks_hold_whole_rows(tmp_path, name):
+    path = write(tmp_path, name)
+    blocks = list(compressed.iter_blocks(path, block_bytes=97))
+    assert len(blocks) > 1
+    assert b''.join(block for block, pos in blocks) == ROWS
+    for block, pos in blocks:
+        assert block.endswith(b'\n') and block.count(b'"') % 2 == 0
+    positions = [pos for block, pos in blocks]
+    assert positions == sorted(positions)
+
+
+def test_last_row_without_newline(tmp_path):
+    path = write(tmp_path, 'data.csv.gz', b'a\n1\n2')
+    assert b''.join(block for block, pos in compressed.iter_blocks(path, block_bytes=2)) == b'1\n2'
+
+
+def test_parse_compressed_like_plain(tmp_path):
+    dt, _ = csvparse.make_dtype([('a', 'Int'), ('s', 'String')])
+    plain = csvparse.parse_table(write(tmp_path, 'data.csv'), dt, processes=1)
+    packed = csvparse.parse_table(write(tmp_path, 'data.csv.gz'), dt, processes=1, chunk_bytes=300)
+    assert np.array_equal(plain['a'], packed['a'])
+    assert np.array_equal(plain['s'], packed['s'])
+
+
+def test_open_file(tmp_path):
+    assert compressed.is_compressed('x.CSV.GZ') and not compressed.is_compressed('x.csv')
+    stream = compressed.open_file(write(tmp_path, 'data.csv.bz2'))
+    try:
+        assert stream.read() == DATA
+    finally:
+        compressed.close(stream)
+
+
+def test_missing_module(tmp_path, monkeypatch):
+    monkeypatch.delitem(compressed.OPENERS, '.zst', raising=False)
+    path = tmp_path / 'data.csv.zst'
+    path.write_bytes(b'')
+    with pytest.raises(IOError):
+        compressed.open_file(str(path))
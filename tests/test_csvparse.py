@@ -0,0 +1,43 @@
+import numpy as np
+
+import csvparse
+from catindex import CategoricalColumn
+
+
+COLUMNS = [('t', 'Float'), ('n', 'Int'), ('ok', 'Bool'), ('name', 'String'), ('k', 'Category')]
+
+
+def write(tmp_path, text, name='data.csv'):
+    path = tmp_path / name
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def test_parse_table_columns(tmp_path):
+    path = write(tmp_path, 't,n,ok,name,k\n0.5,1,true,x,a\n1.5,2,no,y,b\n2.5,3,Y,z,a\n')
+    dt, categories = csvparse.make_dtype(COLUMNS)
+    data = csvparse.parse_table(path, dt, processes=1, categories=categories)
+    assert list(data['t']) == [0.5, 1.5, 2.5]
+    assert list(data['n']) == [1, 2, 3]
+    assert list(data['ok']) == [True, False, True]
+    assert list(data['name']) == [b'x', b'y', b'z']
+    assert isinstance(data['k'], CategoricalColumn)
+    assert list(data['k'].categories) == [b'a', b'b']
+    assert list(np.asarray(data['k'])) == [b'a', b'b', b'a']
+
+
+def test_quoted_fields(tmp_path):
+    path = write(tmp_path, 'a,s\n1,"x,y"\n2,"line\nbreak"\n')
+    dt, _ = csvparse.make_dtype([('a', 'Int'), ('s', 'String')])
+    data = csvparse.parse_table(path, dt, processes=1)
+    assert list(data['a']) == [1, 2]
+    assert list(data['s']) == [b'x,y', b'line\nbreak']
+
+
+def test_chunks_join_in_order(tmp_path):
+    rows = ''.join('%d,%s\n' % (i, 'abc'[i % 3]) for i in range(5000))
+    path = write(tmp_path, 'i,k\n' + rows)
+    dt, categories = csvparse.make_dtype([('i', 'Int'), ('k', 'Category')])
+    data = csvparse.parse_table(path, dt, processes=1, chunk_bytes=1000, categories=categories)
+    assert np.array_equal(data['i'], np.arange(5000))
+    assert np.array_equal(np.asarray(data['k']), np.array([b'abc'[i % 3:i % 3 + 1] for i in range(5000)]))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+import density
+
+
+def test_histogram_counts_cells():
+    x = np.array([0.5, 0.5, 1.5, 3.9, 5.0, np.nan])
+    y = np.array([0.5, 0.5, 0.5, 1.5, 0.5, 0.5])
+    counts = density.histogram(x, y, slice(None), (0, 4), (0, 2), 4, 2)
+    assert counts.tolist() == [[2, 1, 0, 0], [0, 0, 0, 1]]
+
+
+def test_histogram_rows_mask_and_chunks(monkeypatch):
+    monkeypatch.setattr(density, 'CHUNK_ROWS', 3)
+    rng = np.random.default_rng(6)
+    x = rng.uniform(0, 10, 100)
+    y = rng.uniform(0, 10, 100)
+    mask = rng.random(100) < 0.5
+    rows = np.arange(10, 90)
+    counts = density.histogram(x, y, rows, (0, 10), (0, 10), 5, 5, mask)
+    keep = np.zeros(100, dtype=bool)
+    keep[rows] = True
+    keep &= mask
+    expected, _, _ = np.histogram2d(y[keep], x[keep], bins=5, range=((0, 10), (0, 10)))
+    assert counts.tolist() == expected.astype(int).tolist()
+    assert density.histogram(x, y, slice(10, 90), (0, 10), (0, 10), 5, 5, mask).tolist() == counts.tolist()
+
+
+def test_histogram_of_timestamps():
+    x = np.array(['2024-01-01', '2024-01-02'], dtype='datetime64[ms]')
+    lo, hi = x.view(np.int64)
+    counts = density.histogram(x, np.zeros(2), slice(None), (lo, hi + 1), (-1, 1), 2, 1)
+    assert counts.tolist() == [[1, 1]]
+
+
+def test_shade():
+    counts = np.array([[0, 1], [3, 3]])
+    log = density.shade(counts, 'log')
+    assert np.isnan(log[0, 0]) and log[1, 0] == np.log1p(3)
+    eq = density.shade(counts, 'eq_hist')
+    assert np.isnan(eq[0, 0]) and eq[0, 1] == pytest.approx(1 / 3.) and eq[1, 1] == 1.
+    with pytest.raises(ValueError):
+        density.shade(counts, 'linear')
+
+
+def test_can_bin():
+    assert density.can_bin(np.zeros(2)) and not density.can_bin(np.array([b'a']))
@@ -0,0 +1,52 @@
+import numpy as np
+
+import csvparse
+import engine
+
+
+def run_loader(path, columns=(('a', 'Int'), ('k', 'Category'))):
+    dt, categories = engine.make_dtype(list(columns))
+    events = []
+    loader = engine.Loader(path, dt, lambda event, *args: events.append((event, args)), categories)
+    loader.run()
+    return loader, events
+
+
+def test_loader_done(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a,k\n1,x\n2,y\n')
+    loader, events = run_loader(str(path))
+    assert [event for event, args in events] == ['progress', 'done']
+    data = events[-1][1][1]
+    assert list(data['a']) == [1, 2]
+    assert list(np.asarray(data['k'])) == [b'x', b'y']
+
+
+def test_loader_reports_parse_errors(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a,k\n1,x\nnot a number,y\n')
+    loader, events = run_loader(str(path))
+    assert events[-1][0] == 'error'
+
+
+def test_loader_reports_errors_before_parsing(tmp_path, monkeypatch):
+    path = tmp_path / 'data.csv'
+    path.write_text('a,k\n1,x\n')
+
+    def fail(*args, **kwargs):
+        raise OSError('cannot map file')
+    monkeypatch.setattr(csvparse, 'split_ranges', fail)
+    loader, events = run_loader(str(path))
+    assert events == [('error', (loader, 'cannot map file'))]
+
+
+def test_loader_cancel(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a,k\n1,x\n')
+    dt, categories = engine.make_dtype([('a', 'Int'), ('k', 'Category')])
+    events = []
+    loader = engine.Loader(str(path), dt, lambda event, *args: events.append(event), categories)
+    loader.cancel()
+    loader.run()
+    assert events[-1] == 'cancelled'
+    assert len(loader.snapshot()) == 1
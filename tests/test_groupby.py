@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from catindex import CategoricalIndex
+from groupby import GroupBins
+
+
+def brute(ids, x, y, code, xmin, xmax, bins):
+    """ count, mean, min and max per bin of the rows of code """
+    edges = np.linspace(xmin, xmax, bins + 1)
+    bin = np.floor((x - xmin) * (bins / float(xmax - xmin))).astype(int)
+    out = []
+    for b in range(bins):
+        ys = y[(ids == code) & (bin == b) & ~np.isnan(y)]
+        out.append((len(ys), ys.mean() if len(ys) else np.nan,
+                    ys.min() if len(ys) else np.nan, ys.max() if len(ys) else np.nan))
+    return edges, np.array(out)
+
+
+@pytest.mark.parametrize('monotonic', [False, True])
+@pytest.mark.parametrize('selected', [[0], [0, 1, 2, 3, 4]])
+def test_aggregates_match_brute_force(monotonic, selected):
+    rng = np.random.default_rng(3)
+    n = 5000
+    ids = rng.integers(0, 5, n)
+    x = np.sort(rng.uniform(0, 100, n)) if monotonic else rng.uniform(0, 100, n)
+    y = rng.standard_normal(n)
+    y[::50] = np.nan
+    index = CategoricalIndex.from_values(ids)
+    groups = GroupBins(index, selected, x, y, 20., 80., 12, monotonic)
+    assert len(groups) == len(selected)
+    for i, code in enumerate(selected):
+        edges, expected = brute(ids, x, y, code, 20., 80., 12)
+        assert np.array_equal(groups.count[i], expected[:, 0])
+        assert np.allclose(groups.mean[i], expected[:, 1], equal_nan=True)
+        assert np.allclose(groups.min[i], expected[:, 2], equal_nan=True)
+        assert np.allclose(groups.max[i], expected[:, 3], equal_nan=True)
+
+
+def test_lines_and_envelopes():
+    ids = np.array([0, 1, 0, 1, 0])
+    x = np.array([0., 1., 2., 3., 9.])
+    y = np.array([1., 2., 3., 4., 5.])
+    groups = GroupBins(CategoricalIndex.from_values(ids), [0, 1], x, y, 0., 10., 2)
+    mean = groups.lines('Mean')
+    assert mean[0].tolist() == [[2.5, 2.], [7.5, 5.]]
+    assert mean[1].tolist() == [[2.5, 3.]]
+    assert groups.lines('Count')[1].tolist() == [[2.5, 2.]]
+    assert groups.lines('Series')[0].tolist() == [[0., 1.], [2., 3.], [9., 5.]]
+    assert groups.envelopes()[1].tolist() == [[2.5, 2.], [2.5, 4.]]
@@ -0,0 +1,48 @@
+import infer
+
+
+def result(rows):
+    counter = infer.TypeCounter(1)
+    counter.add([[value] for value in rows])
+    return counter.result()[0][0]
+
+
+def test_types():
+    assert result(['1', '-2', '3']) == 'Int'
+    assert result(['1', '2.5']) == 'Float'
+    assert result(['true', 'no']) == 'Bool'
+    assert result(['2024-01-02', '2024-01-03 10:00:00']) == 'Timestamp'
+
+
+def test_category_and_string():
+    assert result(['ab'[i % 2] for i in range(100)]) == 'Category'
+    assert result(['v%d' % i for i in range(100)]) == 'String'
+
+
+def test_string_confidence():
+    counter = infer.TypeCounter(1)
+    counter.add([[str(i)] for i in range(999)] + [['abc']])
+    assert counter.result()[0] == ('String', 1.0, 1000)
+
+
+def test_sample_lines(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a\n' + ''.join('%d\n' % i for i in range(100000)))
+    lines = infer.sample_lines(str(path))
+    assert len(lines) <= infer.HEAD_LINES + infer.SEEKS * infer.SEEK_LINES
+    assert all(line.endswith(b'\n') and line.strip().isdigit() for line in lines)
+    header, types = infer.infer_sample(str(path))
+    assert header == ['a'] and types[0][0] == 'Int'
+
+
+def test_infer_file(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('a,b\n' + ''.join('%d,%s\n' % (i, 'xy'[i % 2]) for i in range(50)))
+    header, types = infer.infer_file(str(path))
+    assert header == ['a', 'b']
+    assert [t[0] for t in types] == ['Int', 'Category']
+
+
+def test_distinct_overflow_is_not_category():
+    n = 4 * (infer.DISTINCT_CAP + 1)
+    assert result(['v%d' % (i % (infer.DISTINCT_CAP + 1)) for i in range(n)]) == 'String'
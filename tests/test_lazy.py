@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import lazy
+
+
+def write(tmp_path, data):
+    path = tmp_path / 'data.csv'
+    path.write_bytes(data)
+    return str(path)
+
+
+COLUMNS = [('a', 'Int'), ('k', 'Category')]
+
+
+@pytest.mark.parametrize('data', [
+    b'a,k\n1,x\n2,y\n3,x\n',
+    b'a,k\n1,x\n2,y\n3,x',
+    b'a,k\n1,x\n\n2,y\n\n\n3,x\n\n',
+    b'a,k\r\n1,x\r\n\r\n2,y\r\n3,x\r\n',
+])
+def test_blank_lines_are_not_rows(tmp_path, data):
+    path = write(tmp_path, data)
+    index = lazy.RowIndex.build(path)
+    assert index.rows == 3
+    table = lazy.LazyTable(path, COLUMNS, index, processes=1)
+    assert list(table['a']) == [1, 2, 3]
+    assert list(np.asarray(table['k'])) == [b'x', b'y', b'x']
+
+
+def test_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(lazy, 'SCAN_BYTES', 64)
+    lines = []
+    for i in range(200):
+        lines.append(b'%d,"k%d"\n' % (i, i % 7))
+        if i % 13 == 0:
+            lines.append(b'\n')
+    path = write(tmp_path, b'a,k\n' + b''.join(lines))
+    index = lazy.RowIndex.build(path)
+    assert index.rows == 200
+    assert len(index.ranges()) > 1
+    assert index.block_rows().sum() == 200
+    table = lazy.LazyTable(path, COLUMNS, index, processes=1)
+    assert np.array_equal(table['a'], np.arange(200))
+    assert table['k'][8] == b'k1'
+
+
+def test_quoted_newlines_do_not_split_rows(tmp_path):
+    path = write(tmp_path, b'a,k\n1,"x\ny"\n2,z\n')
+    assert lazy.RowIndex.build(path).rows == 2
+
+
+def test_eviction_keeps_budget(tmp_path):
+    path = write(tmp_path, b'a,b\n' + b''.join(b'%d,%d\n' % (i, i) for i in range(100)))
+    index = lazy.RowIndex.build(path)
+    table = lazy.LazyTable(path, [('a', 'Int'), ('b', 'Int')], index, budget=1000, processes=1)
+    table['a']
+    table['b']
+    assert not table.is_loaded('a')
+    assert table.is_loaded('b')
+    assert list(table['a'][:3]) == [0, 1, 2]
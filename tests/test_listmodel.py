@@ -0,0 +1,63 @@
+import numpy as np
+
+from listmodel import ListModel, text
+
+
+def model():
+    return ListModel(np.array([b'beta', b'Alpha', b'gamma', b'alphabet']), np.array([3, 1, 2, 5]))
+
+
+def test_rows_in_item_order():
+    items = model()
+    assert len(items) == items.count() == 4
+    assert [items.text(row, 0) for row in range(len(items))] == ['beta', 'Alpha', 'gamma', 'alphabet']
+    assert items.value(2, 1) == 2
+
+
+def test_filter_ignores_case():
+    items = model()
+    items.filter('ALPHA')
+    assert list(items.order) == [1, 3]
+    assert items.row_of(3) == 1 and items.row_of(0) == -1
+    items.filter('')
+    assert len(items) == 4
+
+
+def test_sort():
+    items = model()
+    items.sort(1)
+    assert list(items.order) == [1, 2, 0, 3]
+    items.sort(1, descending=True)
+    assert list(items.order) == [3, 0, 2, 1]
+    items.sort(None)
+    assert list(items.order) == [0, 1, 2, 3]
+
+
+def test_selection_survives_filter_and_sort():
+    items = model()
+    items.filter('alpha')
+    items.set_selected_rows([1])
+    assert list(items.selected_items()) == [3]
+    items.filter('')
+    items.sort(1, descending=True)
+    assert list(items.selected_rows()) == [0]
+    items.filter('a')
+    items.set_selected_rows([])
+    assert list(items.selected_items()) == []
+
+
+def test_append_and_delete():
+    items = ListModel(np.array(['a', 'b'], dtype=object), np.array(['Int', 'Float'], dtype=object))
+    items.append('c', 'Bool')
+    assert items.count() == 3 and items.value(2, 1) == 'Bool'
+    items.set_selected_rows([0])
+    items.delete(1)
+    assert [items.value(i, 0) for i in range(items.count())] == ['a', 'c']
+    assert list(items.selected_items()) == [0]
+    items.set_value(1, 1, 'Int')
+    assert items.value(1, 1) == 'Int'
+
+
+def test_text():
+    assert text(b'caf\xc3\xa9') == u'caf\xe9'
+    assert text(5) == '5'
@@ -0,0 +1,49 @@
+import numpy as np
+
+import lod
+
+
+def test_pairs_in_row_order():
+    y = np.zeros(100000)
+    y[1000::2000] = 5.
+    y[1500::2000] = -5.
+    x = np.arange(len(y), dtype=float)
+    xs, ys = lod.decimate(x, lod.Pyramid(y), 0, len(y), 50)
+    assert np.all(np.diff(xs) >= 0)
+    assert np.array_equal(ys, y[xs.astype(int)])
+    assert ys.max() == 5. and ys.min() == -5.
+
+
+def test_update_matches_rebuild():
+    y = np.random.default_rng(2).standard_normal(50000)
+    y[::97] = np.nan
+    pyramid = lod.Pyramid(y[:20000])
+    pyramid.update(y)
+    rebuilt = lod.Pyramid(y)
+    for grown, level in zip(pyramid.levels, rebuilt.levels):
+        n = level[2]
+        assert grown[2] == n
+        for i in (0, 1, 3, 4):
+            assert np.array_equal(grown[i][:n], level[i][:n], equal_nan=True)
+
+
+def test_short_view_is_not_decimated():
+    y = np.arange(10.)
+    xs, ys = lod.decimate(y, lod.Pyramid(y), 2, 5, 100)
+    assert list(xs) == [1., 2., 3., 4., 5., 6.]
+
+
+def test_points_are_on_the_series_at_any_view():
+    rng = np.random.default_rng(4)
+    y = rng.standard_normal(200000).cumsum()
+    y[rng.integers(0, len(y), 100)] = np.nan
+    pyramid = lod.Pyramid(y)
+    for i in range(50):
+        lo = int(rng.integers(0, len(y) - 5000))
+        hi = int(rng.integers(lo + 5000, len(y) + 1))
+        rows, values = pyramid.minmax(lo, hi, int(rng.integers(50, 500)))
+        assert np.all(np.diff(rows) >= 0)
+        assert lo <= rows.min() and rows.max() < hi
+        assert np.array_equal(values, y[rows], equal_nan=True)
+        assert np.nanmax(values) == np.nanmax(y[lo:hi])
+        assert np.nanmin(values) == np.nanmin(y[lo:hi])
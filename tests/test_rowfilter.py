@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from catindex import CategoricalColumn
+from rowfilter import FilterError, RowFilter
+from table import ColumnTable
+
+
+def table():
+    return ColumnTable(['x', 'k', 'my col'], [
+        np.array([1., 5., np.nan, 9.]),
+        CategoricalColumn.encode(np.array([b'm', b'z', b'a', b'm'])),
+        np.array([0, 1, 0, 1])])
+
+
+def evaluate(text):
+    data = table()
+    return list(RowFilter(text, data.names).evaluate(data))
+
+
+def test_numeric_and_boolean():
+    assert evaluate('x > 2 and not isnan(x)') == [False, True, False, True]
+    assert evaluate('1 < x <= 5 or x == 9') == [False, True, False, True]
+    assert evaluate("col('my col') == 1") == [False, True, False, True]
+
+
+def test_category_compare_on_codes():
+    assert evaluate("k == 'm'") == [True, False, False, True]
+    assert evaluate("k != 'q'") == [True, True, True, True]
+    assert evaluate("k < 'n'") == [True, False, True, True]
+    assert evaluate("'n' < k") == [False, True, False, False]
+    assert evaluate("k in ('a', 'z')") == [False, True, True, False]
+    assert evaluate("k not in ['m']") == [False, True, True, False]
+
+
+def test_evaluate_from_start():
+    data = table()
+    assert list(RowFilter('x > 2', data.names).evaluate(data, 2)) == [False, True]
+
+
+def test_key_ignores_spacing():
+    assert RowFilter('x>2', ['x']).key == RowFilter(' x  >  2 ', ['x']).key
+
+
+@pytest.mark.parametrize('text', ['y > 1', '__import__("os")', 'x.real > 1', 'x > '])
+def test_rejected(text):
+    with pytest.raises(FilterError):
+        RowFilter(text, ['x'])
+
+
+def test_not_a_condition():
+    data = table()
+    with pytest.raises(FilterError):
+        RowFilter('x + 1', data.names).evaluate(data)
+
+
+def test_category_compare_with_appended_vocabulary():
+    column = CategoricalColumn(np.array([b'z', b'a', b'm']), np.array([0, 1, 2, 0], dtype=np.uint32),
+                               np.array([1, 2, 0]))
+    data = ColumnTable(['k'], [column])
+    for text, expected in (("k == 'z'", [True, False, False, True]),
+                           ("k < 'n'", [False, True, True, False]),
+                           ("k >= 'm'", [True, False, True, True]),
+                           ("k in ('a', 'q')", [False, True, False, False])):
+        assert list(RowFilter(text, data.names).evaluate(data)) == expected
+
+
+def test_chunks(monkeypatch):
+    import rowfilter
+    monkeypatch.setattr(rowfilter, 'CHUNK_ROWS', 3)
+    data = ColumnTable(['x'], [np.arange(10.)])
+    assert list(np.flatnonzero(RowFilter('x % 4 == 1', data.names).evaluate(data, 2))) == [3, 7]
+
+
+def test_view_masks_are_kept_and_extended():
+    import engine
+    data = ColumnTable(['x'], [np.array([1., 5.])])
+    view = engine.DataView(data)
+    row_filter = RowFilter('x > 2', data.names)
+    mask = view.mask(row_filter)
+    assert view.mask(RowFilter('x>2', data.names)) is mask
+    grown = view.extended(ColumnTable(['x'], [np.array([1., 5., 3., 0.])]))
+    assert list(grown.mask(row_filter)) == [False, True, True, False]
+    assert list(np.isnan(grown.filtered('x', row_filter))) == [True, False, False, True]
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import csvparse
+from tail import CategoryBuffer, FileFollower
+
+
+COLUMNS = [('a', 'Int'), ('k', 'Category')]
+
+
+def follower(tmp_path, text, window=None):
+    path = tmp_path / 'data.csv'
+    path.write_bytes(text)
+    dt, categories = csvparse.make_dtype(COLUMNS)
+    return str(path), FileFollower(str(path), dt, csvparse.header_end(str(path)), categories, window)
+
+
+def append(path, text):
+    with open(path, 'ab') as f:
+        f.write(text)
+
+
+def test_poll_appends_complete_rows(tmp_path):
+    path, tail = follower(tmp_path, b'a,k\n1,x\n')
+    assert tail.poll() == 1
+    append(path, b'2,y\n3,')
+    assert tail.poll() == 1
+    append(path, b'x\n')
+    assert tail.poll() == 1
+    assert tail.poll() == 0
+    table = tail.table()
+    assert list(table['a']) == [1, 2, 3]
+    assert list(np.asarray(table['k'])) == [b'x', b'y', b'x']
+
+
+def test_poll_waits_for_closing_quote(tmp_path):
+    path, tail = follower(tmp_path, b'a,k\n1,x\n')
+    tail.poll()
+    append(path, b'2,"multi\n')
+    assert tail.poll() == 0
+    append(path, b'line"\n3,z\n')
+    assert tail.poll() == 2
+    assert list(np.asarray(tail.table()['k'])) == [b'x', b'multi\nline', b'z']
+
+
+def test_bad_rows_are_not_consumed(tmp_path):
+    path, tail = follower(tmp_path, b'a,k\n1,x\n')
+    tail.poll()
+    offset = tail.offset
+    append(path, b'2,y,extra\n')
+    with pytest.raises(ValueError):
+        tail.poll()
+    assert tail.offset == offset
+    assert len(tail) == 1
+
+
+def test_truncated_file_is_reread(tmp_path):
+    path, tail = follower(tmp_path, b'a,k\n1,x\n2,y\n')
+    tail.poll()
+    with open(path, 'wb') as f:
+        f.write(b'a,k\n5,z\n')
+    assert tail.poll() == -1
+    assert list(tail.table()['a']) == [5]
+
+
+def test_rolling_window(tmp_path):
+    path, tail = follower(tmp_path, b'a,k\n', window=3)
+    for i in range(10):
+        append(path, b'%d,k%d\n' % (i, i))
+        tail.poll()
+    table = tail.table()
+    assert list(table['a']) == [7, 8, 9]
+    assert list(np.asarray(table['k'])) == [b'k7', b'k8', b'k9']
+
+
+def test_category_buffer_keeps_codes_as_values_arrive():
+    buf = CategoryBuffer('S10')
+    buf.extend(np.array([b'm', b'z']))
+    codes = buf.view().codes.copy()
+    buf.extend(np.array([b'a', b'm', b'q']))
+    column = buf.view()
+    assert np.array_equal(column.codes[:2], codes)
+    assert list(column.categories[column.sorter]) == [b'a', b'm', b'q', b'z']
+    assert list(np.asarray(column)) == [b'm', b'z', b'a', b'm', b'q']
+
+
+def test_category_buffer_window_prunes_vocabulary():
+    buf = CategoryBuffer('S10', window=4)
+    renumbered = []
+    for i in range(40):
+        buf.extend(np.array([b'v%02d' % i]))
+        if buf.renumbered is not None:
+            renumbered.append(buf.renumbered)
+    column = buf.view()
+    assert list(np.asarray(column)) == [b'v36', b'v37', b'v38', b'v39']
+    assert len(column.categories) <= 8
+    assert renumbered and all(remap.min() == -1 for remap in renumbered)